@@ -7,6 +7,9 @@ var BIDDING_DATA = {
         } else {
             var popup = $('<tr class="bidding_popup"><td class="n">&nbsp;</td><td class="bidding_cell noc" colspan="1000"></td></tr>');
             var bidding = BIDDING_DATA.data[element.attr('data-bidding-link')] || BIDDING_DATA.errorString;
+            if ($.isArray(bidding)) {
+                bidding = BIDDING_DATA.render_bidding(bidding);
+            }
             popup.find('.bidding_cell').html(bidding);
             element.closest('tr').after(popup);
             element.data('bidding-row', popup);
@@ -14,10 +17,74 @@ var BIDDING_DATA = {
         return false;
     },
 
+    // compact bidding: [empty cells before dealer, call codes...]
+    render_bidding: function(bidding) {
+        var cells = [];
+        for (var i = 0; i < bidding[0]; i++) {
+            cells.push('');
+        }
+        for (var c = 1; c < bidding.length; c++) {
+            cells.push(BIDDING_DATA.render_call(bidding[c]));
+        }
+        while (cells.length % BIDDING_DATA.directions.length) {
+            cells.push('');
+        }
+        var html = '<table><tr><th>' + BIDDING_DATA.directions.join('</th><th>') + '</th></tr>';
+        for (var row = 0; row < cells.length; row += BIDDING_DATA.directions.length) {
+            html += '<tr><td>' + cells.slice(row, row + BIDDING_DATA.directions.length).join('</td><td>') + '</td></tr>';
+        }
+        return html + '</table>';
+    },
+
+    // call codes: PASS, X, XX, SkipBid, then 1C, 1D, 1H, 1S, 1NT, 2C...
+    render_call: function(call) {
+        if (typeof call != 'number') {
+            return $('<div/>').text(call).html();
+        }
+        if (call < BIDDING_DATA.calls.length) {
+            return BIDDING_DATA.calls[call];
+        }
+        call -= BIDDING_DATA.calls.length;
+        return (Math.floor(call / BIDDING_DATA.denominations.length) + 1) + '<img src="images/' + BIDDING_DATA.denominations[call % BIDDING_DATA.denominations.length] + '.gif"/>';
+    },
+
+    // packed binary bidding: header, offset table with pair numbers, call codes
+    unpack_bidding: function(buffer) {
+        var view = new DataView(buffer);
+        var bytes = new Uint8Array(buffer);
+        var data = {};
+        if (String.fromCharCode(bytes[0], bytes[1], bytes[2], bytes[3]) != 'JFRB' || bytes[4] != 1) {
+            return data;
+        }
+        var count = view.getUint16(5, true);
+        for (var i = 0; i < count; i++) {
+            var entry = 7 + i * 8;
+            var start = view.getUint32(entry + 4, true);
+            var end = (i + 1 < count) ? view.getUint32(entry + 12, true) : bytes.length;
+            var bidding = [bytes[start]];
+            for (var b = start + 1; b < end; b++) {
+                bidding.push(bytes[b] == 255 ? '' : (bytes[b] == 254 ? '?' : bytes[b]));
+            }
+            data[view.getUint16(entry, true) + '_' + view.getUint16(entry + 2, true)] = bidding;
+        }
+        return data;
+    },
+
     load_bidding: function() {
         $('a.biddingLink').hide();
         var dataLink = $('link[rel="bidding-file"]');
-        if (dataLink.size() > 0) {
+        if (dataLink.size() > 0 && /\.bin$/.test(dataLink.eq(0).attr('src'))) {
+            var request = new XMLHttpRequest();
+            request.open('GET', dataLink.eq(0).attr('src'));
+            request.responseType = 'arraybuffer';
+            request.onloadend = function() {
+                if (request.status == 200 && request.response) {
+                    BIDDING_DATA.data = BIDDING_DATA.unpack_bidding(request.response);
+                }
+                $('a.biddingLink').show();
+            };
+            request.send();
+        } else if (dataLink.size() > 0) {
             $.ajax(
                 {
                     url: dataLink.eq(0).attr('src'),
@@ -38,6 +105,10 @@ var BIDDING_DATA = {
         });
     },
 
+    directions: ['W', 'N', 'E', 'S'],
+    calls: ['PASS', 'X', 'XX', '( - )'],
+    denominations: ['C', 'D', 'H', 'S', 'N'],
+
     data: {},
     errorString: 'Brak danych'
 };
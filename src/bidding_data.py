@@ -5,18 +5,29 @@ Utility to insert HTML tables with bidding data into traveller files generated
 by JFR Pary.
 """
 
+import cgi
+import codecs
 import glob
 import logging as log
 import hashlib
 import json
 import re
 import socket
+import struct
 import sys
-from os import mkdir, path, remove, sep
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from os import mkdir, path, remove, sep, stat
 
-import pypyodbc
+import lxml.etree
+import lxml.html
+from bs4 import BeautifulSoup as bs4, __version__ as BS4_VERSION
+from bs4.dammit import EncodingDetector, EntitySubstitution
 
-from bs4 import BeautifulSoup as bs4
+from bidding_data_files import DirectorySnapshot
+from bidding_data_sources import BWSSnapshot, SOURCE_TYPES, get_data_source
 
 __version__ = '1.2rc1'
 
@@ -30,130 +41,446 @@ def isfile(file_path):
 
 
 def hash_file(file_path, block=65536):
-    """Return MD5 hash of a specified file."""
-    if path.exists(file_path):
-        with file(file_path) as file_obj:
+    """Return MD5 hash of a specified file (None if it cannot be read)."""
+    try:
+        with file(file_path, 'rb') as file_obj:
             file_hash = hashlib.md5()
             file_buffer = file_obj.read(block)
             while len(file_buffer) > 0:
                 file_hash.update(file_buffer)
                 file_buffer = file_obj.read(block)
             return file_hash.hexdigest()
-    return None
+    except IOError:
+        return None
+
+
+def get_files_fingerprint(file_paths, directory=None):
+    """
+    Return sizes and modification times of specified files.
+
+    Stats are read from directory snapshot, if it's provided.
+    """
+    fingerprint = {}
+    for file_path in file_paths:
+        if directory is not None:
+            file_stat = directory.stat(file_path)
+            if file_stat is not None:
+                fingerprint[file_path] = list(file_stat)
+        elif isfile(file_path):
+            file_stat = stat(file_path)
+            fingerprint[file_path] = [file_stat.st_size, file_stat.st_mtime]
+    return fingerprint
+
+
+class CodeTable(object):
+    """
+    Interned string values, coded as small integers.
+
+    Values not known in advance are added as they are encountered.
+    """
+
+    __slots__ = ['values', 'codes']
+
+    def __init__(self, values):
+        """Construct code table with initial values."""
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        """Return code for a value."""
+        if value not in self.codes:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+        return self.codes[value]
+
+    def decode(self, code):
+        """Return value for a code."""
+        return self.values[code]
+
+
+# player directions, as stored in BWS
+DIRECTIONS = CodeTable(['N', 'E', 'S', 'W'])
+# calls, as stored in BWS, in order of their codes in bidding-data files
+CALL_VALUES = ['PASS', 'X', 'XX', 'SkipBid'] + [
+    str(level) + denomination
+    for level in range(1, 8) for denomination in ['C', 'D', 'H', 'S', 'NT']]
+CALL_CODES = {call: code for code, call in enumerate(CALL_VALUES)}
+CALLS = CodeTable(CALL_VALUES)
+
+# bidding-data file formats: rendered HTML or call codes, rendered by JS
+# (in JSON or packed binary files)
+OUTPUT_FORMATS = ['html', 'compact', 'binary']
+# packed binary bidding-data: file signature and format version
+BINARY_SIGNATURE = 'JFRB'
+BINARY_VERSION = 1
+# packed binary bidding-data: codes of empty cells and unknown calls
+BINARY_EMPTY = 255
+BINARY_UNKNOWN = 254
+
+
+class Call(object):
+    """
+    Single call of an auction, with direction and call coded as integers.
+
+    Emulates dictionary of the call: {'direction': ..., 'bid': ...}.
+    """
+
+    __slots__ = ['direction', 'bid']
+
+    def __init__(self, direction, bid):
+        """Construct call from direction and call codes."""
+        self.direction = direction
+        self.bid = bid
+
+    def __getitem__(self, key):
+        """Return direction or call value."""
+        if key == 'direction':
+            return DIRECTIONS.decode(self.direction)
+        if key == 'bid':
+            return CALLS.decode(self.bid)
+        raise KeyError(key)
+
+    def __repr__(self):
+        """Represent call in dictionary form."""
+        return repr({'direction': self['direction'], 'bid': self['bid']})
+
+
+class Auction(object):
+    """
+    Calls of a single auction, ordered by their counters.
+
+    Calls are stored column-wise, in arrays of integer codes.
+    Emulates dictionary of calls: {counter: {'direction': ..., 'bid': ...}}.
+    """
+
+    __slots__ = ['counters', 'directions', 'bids']
+
+    def __init__(self):
+        """Construct empty auction."""
+        self.counters = array('H')
+        self.directions = array('B')
+        self.bids = array('B')
+
+    def __index(self, counter):
+        index = bisect_left(self.counters, counter)
+        if index < len(self.counters) and self.counters[index] == counter:
+            return index
+        return None
+
+    def __len__(self):
+        """Return number of calls."""
+        return len(self.counters)
+
+    def __iter__(self):
+        """Iterate over call counters."""
+        return iter(self.counters)
+
+    def __contains__(self, counter):
+        """Check if call with specified counter exists."""
+        return self.__index(counter) is not None
+
+    def __getitem__(self, counter):
+        """Return call with specified counter."""
+        index = self.__index(counter)
+        if index is None:
+            raise KeyError(counter)
+        return Call(self.directions[index], self.bids[index])
+
+    def __repr__(self):
+        """Represent auction in dictionary form."""
+        return repr(self.to_dict())
+
+    def keys(self):
+        """Return call counters."""
+        return list(self.counters)
+
+    def get_key(self):
+        """
+        Return hashable key of the auction.
+
+        Key consists of calls in order and players making them,
+        so it covers dealer position as well.
+        """
+        return (self.directions.tostring(), self.bids.tostring())
+
+    def add(self, counter, direction, bid):
+        """Add call (or replace call with the same counter)."""
+        index = self.__index(counter)
+        if index is not None:
+            self.directions[index] = DIRECTIONS.encode(direction)
+            self.bids[index] = CALLS.encode(bid)
+        else:
+            index = bisect_left(self.counters, counter)
+            self.counters.insert(index, counter)
+            self.directions.insert(index, DIRECTIONS.encode(direction))
+            self.bids.insert(index, CALLS.encode(bid))
+
+    def pop(self, counter, default=None):
+        """Remove call with specified counter and return it."""
+        index = self.__index(counter)
+        if index is None:
+            return default
+        call = Call(self.directions[index], self.bids[index])
+        del self.counters[index]
+        del self.directions[index]
+        del self.bids[index]
+        return call
+
+    def to_dict(self):
+        """Convert auction to dictionary of calls."""
+        return {counter: {'direction': self[counter]['direction'],
+                          'bid': self[counter]['bid']}
+                for counter in self.counters}
+
+    @staticmethod
+    def from_dict(calls):
+        """Construct auction from dictionary of calls."""
+        auction = Auction()
+        for counter, call in calls.iteritems():
+            auction.add(int(counter), call['direction'], call['bid'])
+        return auction
+
+
+class BoardKey(namedtuple('BoardKey',
+                          ['board', 'round', 'sector', 'table'])):
+    """
+    Identity of a board played in BWS: board, round, sector and table.
+
+    String form, {board}_{round}_{sector}_{table}, is only used for output.
+    """
+
+    __slots__ = ()
+
+    @property
+    def table_key(self):
+        """Return (sector, table) key of lineup the board was played in."""
+        return (self.sector, self.table)
+
+    def __str__(self):
+        """Compile string form of the board key."""
+        return '_'.join([str(s) for s in self])
+
+
+class RenderCache(object):
+    """
+    Rendered HTML of recent auctions, with least recently used evicted.
+
+    Counts cache hits and misses.
+    """
+
+    def __init__(self, size=1024):
+        """Construct empty cache for a specified number of auctions."""
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def get(self, key):
+        """Return rendered HTML for an auction key, or None."""
+        rendered = self.__entries.pop(key, None)
+        if rendered is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # re-insert to mark entry as recently used
+        self.__entries[key] = rendered
+        return rendered
+
+    def put(self, key, rendered):
+        """Store rendered HTML for an auction key."""
+        self.__entries[key] = rendered
+        if len(self.__entries) > self.size:
+            self.__entries.popitem(last=False)
 
 
 def parse_lineup_data(sitting_data):
     """
     Convert BWS lineup to dictionary structure.
 
-    Structure: {round}.{sector}_{table}.{pair numbers}
+    Structure: {round}.({sector}, {table}).({pair numbers})
     """
     round_lineups = {}
     for sitting in sitting_data:
         log.getLogger('lineup').debug(sitting)
-        round_no = sitting[2] if sitting[2] is not None else 0
-        table_no = str(sitting[0]) + '_' + str(sitting[1])
-        lineup = sorted([sitting[3], sitting[4]])
+        round_no = sitting.round if sitting.round is not None else 0
+        table_no = (sitting.section, sitting.table)
+        lineup = tuple(sorted([sitting.ns_pair, sitting.ew_pair]))
         if round_no not in round_lineups:
             round_lineups[round_no] = {}
         round_lineups[round_no][table_no] = lineup
-        log.getLogger('lineup').debug('round %d, table %s: %s',
-                                      round_no, table_no, lineup)
+        log.getLogger('lineup').debug('round %d, table %s-%s: %s',
+                                      round_no, table_no[0], table_no[1],
+                                      lineup)
     return round_lineups
 
 
+def parse_round_data(round_data):
+    """
+    Convert BWS round data to lineups and board number ranges.
+
+    Returns lineups (see parse_lineup_data) and RoundData rows
+    with board number ranges to map.
+    """
+    board_ranges = []
+
+    def collect_board_ranges(rows):
+        """Pass RoundData rows through, storing their board ranges."""
+        for row in rows:
+            # JFR number for the first board is not present in all BWS files
+            if row.jfr_board is not None:
+                board_ranges.append(row)
+            yield row
+    return parse_lineup_data(collect_board_ranges(round_data)), board_ranges
+
+
 def merge_timestamps(date_stamp, time_stamp):
     """
     Merge two timestamps into a single one.
 
     First timestamp contains date, second - time.
+    Value: integer number of seconds since 0001-01-01.
     """
-    return ''.join([date_stamp.strftime('%Y%m%d'),
-                    time_stamp.replace(year=1900).strftime('%H%M%S')])
+    return date_stamp.toordinal() * 86400 + time_stamp.hour * 3600 \
+        + time_stamp.minute * 60 + time_stamp.second
+
+
+def format_timestamp(timestamp):
+    """Format merged timestamp for logging."""
+    (days, seconds) = divmod(timestamp, 86400)
+    return datetime.fromordinal(days).replace(
+        hour=seconds // 3600,
+        minute=seconds // 60 % 60,
+        second=seconds % 60).strftime('%Y-%m-%d %H:%M:%S')
 
 
 def get_board_number(entry):
     """
-    Compile board_number from BWS entry.
+    Compile board key from BWS entry.
 
-    Value: {board}_{round}_{sector}_{table}
+    Value: BoardKey(board, round, sector, table)
     """
-    return '_'.join([
-        str(s) for s in [entry[4], entry[3], entry[1], entry[2]]])
+    return BoardKey(entry.board, entry.round, entry.section, entry.table)
 
 
 def erase_bid(bidding, bid):
     """Erase bid from bidding."""
-    bid_counter = bid[5]
+    bid_counter = bid.counter
     board_no = get_board_number(bid)
-    if bidding[bid_counter]['direction'] == bid[6]:
+    if bidding[bid_counter]['direction'] == bid.direction:
         bidding.pop(bid_counter, None)
         log.getLogger('bidding').debug(
             'erased bid %d from board %s, ' +
             'round %s, table %s-%s',
-            bid_counter, *board_no.split('_'))
+            bid_counter, *board_no)
     else:
         log.getLogger('bidding').debug(
             'bid does not match, not removing')
     return bidding
 
 
-def parse_bidding_data(bidding_data, erased_boards=None):
+def parse_erased_boards(erased_boards):
     """
-    Convert BWS bidding to dictionary structure.
+    Compile latest erasure timestamps from BWS result entries.
 
-    Keys: {board}_{round}_{sector}_{table}.{sector}_{table}.{round}
-    Values: {bidding}[]
-    Applies call erasures and entries result erasures.
+    Keys: BoardKey
+    Values: merged timestamp of the latest erasure
     """
-    bids = {}
     erased = {}
-    if erased_boards is None:
-        erased_boards = []
     for entry in erased_boards:
         board_no = get_board_number(entry)
-        timestamp = merge_timestamps(entry[13], entry[14])
+        timestamp = merge_timestamps(entry.date_log, entry.time_log)
         if board_no not in erased or erased[board_no] < timestamp:
             erased[board_no] = timestamp
+    return erased
+
+
+def parse_bidding_data(bidding_data, erased=None, bids=None):
+    """
+    Convert BWS bidding to dictionary structure.
+
+    Keys: BoardKey
+    Values: Auction objects
+    Applies call erasures and entries result erasures
+    (latest erasure timestamps, as compiled by parse_erased_boards).
+    If previously parsed bidding is provided, new calls are merged into it.
+    """
+    if bids is None:
+        bids = {}
+    if erased is None:
+        erased = {}
     for bid in bidding_data:
         log.getLogger('bidding').debug(bid)
-        round_no = bid[3]
-        table_no = str(bid[1]) + '_' + str(bid[2])
-        board_no = str(bid[4]) + '_' + str(round_no) + '_' + table_no
-        bid_counter = bid[5]
+        board_no = get_board_number(bid)
+        bid_counter = bid.counter
         if (board_no not in erased or
-                erased[board_no] < merge_timestamps(bid[8], bid[9])):
-            bid_erased = bid[10]
+                erased[board_no] < merge_timestamps(bid.date_log,
+                                                    bid.time_log)):
+            bid_erased = bid.erased
             if board_no not in bids:
-                bids[board_no] = {}
-            if table_no not in bids[board_no]:
-                bids[board_no][table_no] = {}
-            if round_no not in bids[board_no][table_no]:
-                bids[board_no][table_no][round_no] = {}
-            if (bid_erased == 1 and
-                    bid_counter in bids[board_no][table_no][round_no]):
-                bids[board_no][table_no][round_no] = erase_bid(
-                    bids[board_no][table_no][round_no], bid)
-                if len(bids[board_no][table_no][round_no]) == 0:
-                    bids[board_no][table_no].pop(round_no, None)
+                bids[board_no] = Auction()
+            if bid_erased == 1 and bid_counter in bids[board_no]:
+                bids[board_no] = erase_bid(bids[board_no], bid)
+                if len(bids[board_no]) == 0:
+                    bids.pop(board_no, None)
                     log.getLogger('bidding').debug(
                         'bidding on board %s, round %s, ' +
                         'table %s-%s empty, removing',
-                        *board_no.split('_'))
+                        *board_no)
             else:
-                bids[board_no][table_no][round_no][bid_counter] = {
-                    'direction': bid[6], 'bid': bid[7]}
+                bids[board_no].add(bid_counter, bid.direction, bid.bid)
                 log.getLogger('bidding').debug(
                     'board %s, round %s, table %s-%s, bid %d: %s by %s',
-                    *(board_no.split('_') + [bid_counter, bid[7], bid[6]]))
+                    *(board_no + (bid_counter, bid.bid, bid.direction)))
         else:
             log.getLogger('bidding').info(
                 'bid from erased board skipped: ' +
-                'board %s, round %s, table %s-%s, bid %d: %s by %s',
-                *(board_no.split('_') + [bid_counter, bid[7], bid[6]]))
+                'board %s, round %s, table %s-%s, bid %d: %s by %s ' +
+                '(board erased at %s)',
+                *(board_no + (bid_counter, bid.bid, bid.direction,
+                              format_timestamp(erased[board_no]))))
     return bids
 
 
+def get_bid_identity(bid):
+    """
+    Identify BiddingData row beyond its ID.
+
+    IDs start over in a new BWS file, so the row with state watermark ID
+    is compared by its timestamp, board and call counter.
+    """
+    if bid is None:
+        return None
+    return [merge_timestamps(bid.date_log, bid.time_log),
+            str(get_board_number(bid)), bid.counter]
+
+
+def load_bidding_state(state_path):
+    """
+    Read bidding parsed in previous run from JSON state file.
+
+    Restores board keys and integer call counters from JSON string keys.
+    Returns None if the state cannot be read.
+    """
+    if not path.exists(state_path):
+        log.getLogger('state').info(
+            'bidding state %s does not exist', state_path)
+        return None
+    try:
+        with file(state_path) as state_file:
+            state = json.load(state_file)
+        state['bids'] = {
+            BoardKey(*[int(s) for s in board_no.split('_')]):
+            Auction.from_dict(board_data)
+            for board_no, board_data in state['bids'].iteritems()}
+        return state
+    except (IOError, ValueError, KeyError, AttributeError, TypeError) as ex:
+        log.getLogger('state').warning(
+            'unable to read bidding state from %s: %s', state_path, ex)
+        return None
+
+
 def get_dealer(bidding):
     """Return first player to call in a bidding."""
     return bidding[min(bidding.keys())]['direction']
@@ -164,12 +491,692 @@ def get_last_bidder(bidding):
     return bidding[max(bidding.keys())]['direction']
 
 
+# calls with denomination icons, e.g. 1NT
+CALL_PATTERN = re.compile(r'(\d)([SHDCN])')
+
+
+def format_call(call):
+    """Compile HTML table cell for a single call."""
+    call_match = CALL_PATTERN.match(call)
+    if call_match:
+        return u'<td>{0}<img src="images/{1}.gif"/></td>'.format(
+            *call_match.groups())
+    if call == 'SkipBid':
+        call = '( - )'
+    return u'<td>{0}</td>'.format(cgi.escape(call))
+
+
+def render_bidding(bidding, directions):
+    """
+    Compile HTML table for a bidding table, without building its DOM.
+
+    Output is identical to BeautifulSoup-built table (see JFRBidding).
+    """
+    call_cells = {}
+    rows = [u'<tr>' + u''.join([u'<th>{0}</th>'.format(direction)
+                                for direction in directions]) + u'</tr>']
+    for bid_round in bidding:
+        cells = []
+        for call in bid_round:
+            if call not in call_cells:
+                call_cells[call] = format_call(call)
+            cells.append(call_cells[call])
+        rows.append(u'<tr>' + u''.join(cells) + u'</tr>')
+        log.getLogger('b_format').debug('%5s' * 4, *bid_round)
+    return u'<table>' + u''.join(rows) + u'</table>'
+
+
+def compact_bidding(bidding):
+    """
+    Convert bidding table to compact form, rendered by bidding.js.
+
+    Value: [number of empty cells before dealer, call codes...]
+    Calls are listed row by row, empty cells at the end are skipped,
+    except for the one keeping number of rows intact.
+    Calls without a code (and empty cells) are stored as strings.
+    """
+    cells = [call for bid_round in bidding for call in bid_round]
+    dealer_offset = 0
+    while dealer_offset < len(cells) and cells[dealer_offset] == '':
+        dealer_offset += 1
+    last_row = (len(cells) - 1) // 4 * 4
+    while len(cells) > max(dealer_offset, last_row + 1) and cells[-1] == '':
+        cells.pop()
+    return [dealer_offset] + [CALL_CODES.get(call, call)
+                              for call in cells[dealer_offset:]]
+
+
+def pack_bidding(compressed_board):
+    """
+    Pack compact bidding of a board (see compact_bidding) to binary form.
+
+    Header: signature, version (byte), number of auctions (uint16).
+    Offset table, for each auction: pair numbers (2x uint16),
+    offset of auction data from the beginning of file (uint32).
+    Auction data: number of empty cells before dealer, then call codes,
+    single byte each, up to the next auction (or the end of file).
+    All numbers are little-endian.
+    """
+    header = struct.pack('<4sBH', BINARY_SIGNATURE, BINARY_VERSION,
+                         len(compressed_board))
+    offset = len(header) + struct.calcsize('<HHI') * len(compressed_board)
+    offset_table = []
+    auctions = []
+    for pair_numbers, bidding in sorted(compressed_board.items()):
+        calls = []
+        for call in bidding[1:]:
+            if call == '':
+                calls.append(BINARY_EMPTY)
+            elif isinstance(call, basestring):
+                log.getLogger('compress').warning(
+                    'call %s cannot be packed, pairs %s', call, pair_numbers)
+                calls.append(BINARY_UNKNOWN)
+            else:
+                calls.append(call)
+        auction = struct.pack('<%dB' % (len(calls) + 1), bidding[0], *calls)
+        offset_table.append(struct.pack(
+            '<HHI', *([int(pair) for pair in pair_numbers.split('_')] +
+                      [offset])))
+        auctions.append(auction)
+        offset += len(auction)
+    return header + ''.join(offset_table) + ''.join(auctions)
+
+
+# <head> section of HTML page (comments are matched to be skipped,
+# unterminated comment hides the rest of the page)
+HEAD_PATTERN = re.compile(
+    r'<!--(?:.*?-->|.*)|<head\b[^>]*>(.*?)</head\s*>', re.I | re.S)
+# <script> and <link> tags within <head> (comments are matched to be skipped)
+HEAD_TAG_PATTERN = re.compile(
+    r'<!--.*?-->|<(script|link)\b([^>]*)>', re.I | re.S)
+SCRIPT_END_PATTERN = re.compile(r'</script\s*>', re.I)
+# tag attributes (unquoted values may contain slashes,
+# except the closing slash of self-closing tag)
+ATTRIBUTE_PATTERN = re.compile(
+    r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|'
+    r'((?:[^\s"\'>/]|/(?!\s*$))+))')
+# markup of tags put into traveller <head>
+JQUERY_TAG = '<script src="javas/jquery.js" type="text/javascript"></script>'
+BIDDING_SCRIPT_TAG = \
+    '<script src="javas/bidding.js" type="text/javascript"></script>'
+BIDDING_STYLE_TAG = '<link href="css/bidding.css" rel="stylesheet"/>'
+BIDDING_FILE_TAG = '<link rel="bidding-file" src="{0}"/>'
+
+
+def get_head_tags(head):
+    """
+    Find <script> and <link> tags in HTML <head> contents.
+
+    Returns (tag name, attributes, start, end) for each tag,
+    or None if a <script> is not closed.
+    """
+    tags = []
+    for tag_match in HEAD_TAG_PATTERN.finditer(head):
+        if tag_match.group(1) is None:
+            continue
+        attributes = {}
+        for attribute in ATTRIBUTE_PATTERN.finditer(tag_match.group(2)):
+            attributes[attribute.group(1).lower()] = ''.join(
+                [value for value in attribute.groups()[1:] if value])
+        tag_end = tag_match.end()
+        tag_name = tag_match.group(1).lower()
+        if tag_name == 'script':
+            script_end = SCRIPT_END_PATTERN.search(head, tag_end)
+            if script_end is None:
+                return None
+            tag_end = script_end.end()
+        tags.append((tag_name, attributes, tag_match.start(), tag_end))
+    return tags
+
+
+def inject_head_tags(content, bidding_file):
+    """
+    Put bidding scripts, styles and data link into HTML page <head>.
+
+    Page is not parsed, only <head> is scanned for existing tags
+    and the rest of the page is kept intact.
+    jQuery and bidding.css are added if missing, bidding.js and the link
+    to bidding-data file are put right after jQuery (if they're
+    not already there).
+    Returns None if <head> cannot be found.
+    """
+    head_match = None
+    for match in HEAD_PATTERN.finditer(content):
+        if match.group(1) is not None:
+            head_match = match
+            break
+    if head_match is None:
+        return None
+    head = head_match.group(1)
+    tags = get_head_tags(head)
+    if tags is None:
+        return None
+    jquery_scripts = [tag for tag in tags if tag[0] == 'script' and
+                      tag[1].get('src') == 'javas/jquery.js']
+    bidding_scripts = [tag for tag in tags if tag[0] == 'script' and
+                       tag[1].get('src') == 'javas/bidding.js']
+    bidding_files = [tag for tag in tags if tag[0] == 'link' and
+                     tag[1].get('rel') == 'bidding-file']
+    bidding_styles = [tag for tag in tags if tag[0] == 'link' and
+                      tag[1].get('rel') == 'stylesheet' and
+                      tag[1].get('href') == 'css/bidding.css']
+    # tags already in place, in order: jQuery, bidding.js, data link
+    if len(jquery_scripts) and len(bidding_styles) and \
+       len(bidding_scripts) == 1 and len(bidding_files) == 1 and \
+       bidding_files[0][1].get('src') == bidding_file and \
+       jquery_scripts[0][3] <= bidding_scripts[0][2] and \
+       bidding_scripts[0][3] <= bidding_files[0][2] and \
+       not head[jquery_scripts[0][3]:bidding_scripts[0][2]].strip() and \
+       not head[bidding_scripts[0][3]:bidding_files[0][2]].strip():
+        return content
+    bidding_tags = BIDDING_SCRIPT_TAG + \
+        BIDDING_FILE_TAG.format(cgi.escape(bidding_file, True))
+    # (start, end, replacement) edits of <head> contents
+    edits = []
+    for tag in bidding_scripts + bidding_files:
+        # remove tag with the whitespace before it
+        start = tag[2]
+        while start > 0 and head[start - 1].isspace():
+            start -= 1
+        edits.append((start, tag[3], ''))
+    if len(jquery_scripts):
+        edits.append((jquery_scripts[0][3], jquery_scripts[0][3],
+                      bidding_tags))
+        appended_tags = ''
+    else:
+        appended_tags = JQUERY_TAG + bidding_tags
+    if not len(bidding_styles):
+        appended_tags += BIDDING_STYLE_TAG
+    edits.append((len(head), len(head), appended_tags))
+    # edits are applied from the end of <head>, inserts at the same
+    # position in reverse, so that inserted tags keep the order of edits
+    for (start, end, replacement) in sorted(
+            reversed(edits), key=lambda edit: edit[:2], reverse=True):
+        head = head[:start] + replacement + head[end:]
+    return content[:head_match.start(1)] + head + \
+        content[head_match.end(1):]
+
+
 def filter_scripts(header_scripts, name):
     """Return specific scripts from among script tag list."""
     return [script for script in header_scripts
             if script['src'] == name]
 
 
+def inject_head_tags_dom(board_content, bidding_file):
+    """
+    Put bidding scripts, styles and data link into traveller DOM.
+
+    Fallback for inject_head_tags, link to bidding-data file is only
+    put if it's specified.
+    """
+    board_content = bs4(board_content, 'lxml', from_encoding='utf-8')
+    header_scripts = board_content.select('head script')
+    # check for jQuery, append if necessary
+    jquery_scripts = filter_scripts(
+        header_scripts, 'javas/jquery.js')
+    if not len(jquery_scripts):
+        jquery = board_content.new_tag(
+            'script', src='javas/jquery.js',
+            type='text/javascript')
+        jquery_scripts.append(jquery)
+        board_content.head.append(jquery)
+        log.getLogger('scripts').debug('jQuery not found, adding')
+    # check for bidding.js
+    bidding_scripts = filter_scripts(
+        header_scripts, 'javas/bidding.js')
+    log.getLogger('scripts').debug('found %d bidding.js scripts',
+                                   len(bidding_scripts))
+    # and make sure bidding.js is appended after jQuery
+    for script in bidding_scripts:
+        script.extract()
+    bidding_script = board_content.new_tag(
+        'script', src='javas/bidding.js',
+        type='text/javascript')
+    jquery_scripts[0].insert_after(bidding_script)
+    # check for bidding.css
+    bidding_styles = [css for css in
+                      board_content.find_all(
+                          'link',
+                          rel='stylesheet',
+                          href='css/bidding.css')]
+    log.getLogger('scripts').debug('found %d bidding.css sheets',
+                                   len(bidding_styles))
+    # add if none exist
+    if len(bidding_styles) == 0:
+        bidding_style = board_content.new_tag(
+            'link', rel='stylesheet',
+            href='css/bidding.css')
+        board_content.head.append(bidding_style)
+    # link compressed bidding file, right after bidding.js
+    if bidding_file is not None:
+        for link in board_content.findAll('link', rel='bidding-file'):
+            link.extract()
+        bidding_data_tag = board_content.new_tag('link')
+        bidding_data_tag['rel'] = 'bidding-file'
+        bidding_data_tag['src'] = bidding_file
+        bidding_script.insert_after(bidding_data_tag)
+    return board_content.prettify('utf-8', formatter='html')
+
+
+def write_traveller_scripts(tournament_file, bidding_file):
+    """
+    Alter traveller file to include necessary JavaScript.
+
+    Only <head> of a traveller is altered, the whole page is parsed
+    only if <head> cannot be found otherwise.
+    Returns False if the file already had the scripts in place.
+    """
+    with file(tournament_file, 'r+b') as board_html:
+        board_content = board_html.read()
+        new_content = None
+        if bidding_file is not None:
+            new_content = inject_head_tags(
+                board_content, bidding_file.encode('utf-8'))
+        if new_content is None:
+            log.getLogger('scripts').info(
+                'parsing entire traveller file: %s', tournament_file)
+            new_content = inject_head_tags_dom(board_content, bidding_file)
+        if new_content == board_content:
+            return False
+        board_html.seek(0)
+        board_html.write(new_content)
+        board_html.truncate()
+    return True
+
+
+def get_individual_pair_numbers(pair_numbers, board_lineups):
+    """
+    Filter participant numbers.
+
+    Match numbers specified in round data (lineups of the board).
+    """
+    participants = frozenset(pair_numbers)
+    for (lineup_set, lineup) in board_lineups:
+        if lineup_set <= participants:
+            return list(lineup)
+    return pair_numbers
+
+
+# BeautifulSoup version with markup output rules copied below,
+# prettify_element is not used with other versions
+PRETTIFY_BS4_VERSION = '4.9.3'
+# BeautifulSoup markup output rules, see prettify_element
+PRETTIFY_VOID_TAGS = set([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid',
+    'spacer'])
+PRETTIFY_LIST_ATTRIBUTES = {
+    '*': ['class', 'accesskey', 'dropzone'],
+    'a': ['rel', 'rev'], 'link': ['rel', 'rev'],
+    'td': ['headers'], 'th': ['headers'], 'form': ['accept-charset'],
+    'object': ['archive'], 'area': ['rel'], 'icon': ['sizes'],
+    'iframe': ['sandbox'], 'output': ['for']}
+PRETTIFY_LIST_PATTERN = re.compile(r'\S+')
+# tags with contents not formatted as regular text (or with encoding info)
+PRETTIFY_UNSUPPORTED_TAGS = set(
+    ['pre', 'textarea', 'script', 'style', 'template', 'meta'])
+# parser for traveller tables, documents are read as UTF-8 (as by bs4)
+TRAVELLER_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+
+def prettify_element(element):
+    """
+    Render lxml element the way BeautifulSoup prettify does.
+
+    Output matches prettify(formatter='html') of the same markup
+    parsed by BeautifulSoup with lxml, if the element does not contain
+    comments or PRETTIFY_UNSUPPORTED_TAGS.
+    """
+    output = []
+
+    def format_text(text, indent_level):
+        """Render string contained in an element."""
+        text = EntitySubstitution.substitute_html(text).strip()
+        if text:
+            output.append(' ' * (indent_level - 1) + text + '\n')
+
+    def format_element(element, indent_level):
+        """Render element with its contents."""
+        list_attributes = PRETTIFY_LIST_ATTRIBUTES['*'] + \
+            PRETTIFY_LIST_ATTRIBUTES.get(element.tag, [])
+        attributes = ''
+        for (name, value) in sorted(element.attrib.items()):
+            if name in list_attributes:
+                value = ' '.join(PRETTIFY_LIST_PATTERN.findall(value))
+            attributes += ' ' + name + '=' + \
+                EntitySubstitution.quoted_attribute_value(
+                    EntitySubstitution.substitute_html(value))
+        indent = ' ' * (indent_level - 1)
+        if element.tag in PRETTIFY_VOID_TAGS and not element.text \
+                and not len(element):
+            output.append(indent + '<' + element.tag + attributes + '/>\n')
+            return
+        output.append(indent + '<' + element.tag + attributes + '>\n')
+        if element.text:
+            format_text(element.text, indent_level + 1)
+        for child in element:
+            format_element(child, indent_level + 1)
+            if child.tail:
+                format_text(child.tail, indent_level + 1)
+        if not output[-1].endswith('\n'):
+            output.append('\n')
+        output.append(indent + '</' + element.tag + '>')
+        # element followed by anything (even whitespace) ends its line
+        if element.tail or element.getnext() is not None:
+            output.append('\n')
+
+    format_element(element, 1)
+    return u''.join(output)
+
+
+def get_cell_strings(cell):
+    """Join strings put directly into a table cell."""
+    return (cell.text or '') + ''.join(
+        [child.tail for child in cell if child.tail])
+
+
+def get_bidding_links(cell):
+    """Find bidding table links in a table cell."""
+    return [link for link in cell.iter('a')
+            if 'biddingLink' in PRETTIFY_LIST_PATTERN.findall(
+                link.get('class', ''))]
+
+
+def link_traveller_rows(content, pair_tables, board_lineups):
+    """
+    Put links to bidding tables into traveller table markup, with lxml.
+
+    Fast path for link_traveller_rows_dom, producing the same markup.
+    Returns (new markup, pair numbers of linked tables), or None
+    if the markup cannot be processed without BeautifulSoup
+    (or BeautifulSoup version differs from PRETTIFY_BS4_VERSION).
+    """
+    if BS4_VERSION != PRETTIFY_BS4_VERSION:
+        return None
+    if content.startswith(codecs.BOM_UTF8) or \
+       EncodingDetector.find_declared_encoding(content, is_html=True) \
+       not in [None, 'utf-8', 'utf8']:
+        return None
+    try:
+        content.decode('utf-8')
+        document = lxml.html.document_fromstring(
+            content, parser=TRAVELLER_PARSER)
+    except (ValueError, lxml.etree.LxmlError):
+        return None
+    for _ in document.iter(lxml.etree.Comment,
+                           lxml.etree.ProcessingInstruction,
+                           lxml.etree.Entity):
+        return None
+    table = document.find('.//table')
+    if table is None:
+        return None
+    for element in table.iter():
+        if element.tag in PRETTIFY_UNSUPPORTED_TAGS or ':' in element.tag:
+            return None
+        # lxml fills values of attributes without them (<td nowrap>)
+        # with attribute name, BeautifulSoup leaves them empty
+        for (name, value) in element.attrib.iteritems():
+            if value.lower() == name:
+                return None
+    # read all rows first, so that nothing is logged
+    # if the markup is to be processed by BeautifulSoup after all
+    rows = []
+    for row in document.iter('tr'):
+        cells = list(row.iter('td'))
+        pair_numbers = None
+        if len(cells) == 11:
+            if not cells[1].text or not cells[2].text:
+                return None
+            for link in get_bidding_links(cells[3]):
+                if link.tail and \
+                   EntitySubstitution.substitute_html(link.tail).strip():
+                    return None
+            try:
+                pair_numbers = sorted([
+                    int(cell) for cell in
+                    cells[1].text.split('-') + cells[2].text.split('-')])
+            except ValueError:
+                pass
+        rows.append((cells, pair_numbers))
+    links_log = log.getLogger('links')
+    log_rows = links_log.isEnabledFor(log.DEBUG)
+    used_tables = []
+    for (cells, pair_numbers) in rows:
+        if log_rows:
+            links_log.debug('row: %s', ' '.join(
+                [get_cell_strings(cell).strip() for cell in cells]))
+        # traveller table rows for specific score entries
+        # should have 11 cells
+        if len(cells) != 11:
+            links_log.debug('skipping row')
+            continue
+        if pair_numbers is None:
+            links_log.debug('invalid pair numbers, skipping')
+            continue
+        links_log.debug('pairs: %s', pair_numbers)
+        if len(pair_numbers) > 2:
+            # individual event
+            # must determine which numbers are in round data
+            mapped_numbers = get_individual_pair_numbers(
+                pair_numbers, board_lineups)
+            links_log.info(
+                'individual contestant numbers %s mapped '
+                + 'to BWS pair numbers: %s',
+                pair_numbers, mapped_numbers)
+            pair_numbers = mapped_numbers
+        pair_key = '_'.join([str(pair) for pair in pair_numbers])
+        # only append link if we've got bidding data
+        if pair_key in pair_tables:
+            used_tables.append(pair_key)
+            links_log.info('linking: %s', pair_key)
+            # fourth cell is the contract
+            for link in get_bidding_links(cells[3]):
+                links_log.debug('removing existing link')
+                link.drop_tree()
+            bidding_link = lxml.etree.SubElement(
+                cells[3], 'a', href='#', **{'class': 'biddingLink',
+                                            'data-bidding-link': pair_key})
+            bidding_link.text = ' '
+        else:
+            links_log.warning('bidding for file path %s not found', pair_key)
+    return (prettify_element(table).encode('utf-8'), used_tables)
+
+
+def link_traveller_rows_dom(content, pair_tables, board_lineups):
+    """
+    Put links to bidding tables into traveller table markup.
+
+    Links are put only for pair numbers (joined with '_') in pair_tables.
+    Returns new markup and pair numbers of linked tables.
+    """
+    board_text_content = bs4(content, 'lxml')
+    used_tables = []
+    log_rows = log.getLogger('links').isEnabledFor(log.DEBUG)
+    for row in board_text_content.select('tr'):
+        cells = row.select('td')
+        if log_rows:
+            log.getLogger('links').debug(
+                'row: %s',
+                ' '.join([
+                    ''.join([
+                        cc for cc
+                        in c.contents if isinstance(cc, basestring)
+                    ]).strip()
+                    for c in cells]))
+        # traveller table rows for specific score entries
+        # should have 11 cells
+        if len(cells) == 11:
+            try:
+                pair_numbers = sorted([
+                    int(cell) for cell in
+                    cells[1].contents[0].split('-')
+                    + cells[2].contents[0].split('-')
+                ])
+                log.getLogger('links').debug(
+                    'pairs: %s', pair_numbers)
+                if len(pair_numbers) > 2:
+                    # individual event
+                    # must determine which numbers are in round data
+                    mapped_numbers = get_individual_pair_numbers(
+                        pair_numbers, board_lineups)
+                    log.getLogger('links').info(
+                        'individual contestant numbers %s mapped '
+                        + 'to BWS pair numbers: %s',
+                        pair_numbers, mapped_numbers)
+                    pair_numbers = mapped_numbers
+            except ValueError:
+                log.getLogger('links').debug(
+                    'invalid pair numbers, skipping')
+                continue
+            bidding_link = board_text_content.new_tag(
+                'a', href='#', **{'class': 'biddingLink'})
+            bidding_link.string = ' '
+            bidding_link['data-bidding-link'] = '_'.join(
+                [str(pair) for pair in pair_numbers])
+            # only append link if we've got bidding data
+            if bidding_link['data-bidding-link'] in pair_tables:
+                used_tables.append(bidding_link['data-bidding-link'])
+                log.getLogger('links').info(
+                    'linking: %s',
+                    bidding_link['data-bidding-link'])
+                # fourth cell is the contract
+                for link in cells[3].select('a.biddingLink'):
+                    log.getLogger('links').debug(
+                        'removing existing link')
+                    link.extract()
+                cells[3].append(bidding_link)
+            else:
+                log.getLogger('links').warning(
+                    'bidding for file path %s not found',
+                    bidding_link['data-bidding-link'])
+        else:
+            log.getLogger('links').debug('skipping row')
+    return (board_text_content.table.prettify('utf-8', formatter='html'),
+            used_tables)
+
+
+def write_traveller_links(board_text_path, pair_tables, board_lineups):
+    """
+    Alter traveller file to include links to bidding tables.
+
+    Links are put only for pair numbers (joined with '_') in pair_tables.
+    Returns pair numbers of linked tables and a flag telling
+    if the file was written (False if it had the links already).
+    """
+    with file(board_text_path, 'r+') as board_text:
+        original_content = board_text.read()
+        linked_content = link_traveller_rows(
+            original_content, pair_tables, board_lineups)
+        if linked_content is None:
+            log.getLogger('links').info(
+                'parsing traveller with BeautifulSoup: %s', board_text_path)
+            linked_content = link_traveller_rows_dom(
+                original_content, pair_tables, board_lineups)
+        (new_content, used_tables) = linked_content
+        if new_content == original_content:
+            return (used_tables, False)
+        board_text.seek(0)
+        board_text.write(new_content)
+        board_text.truncate()
+    return (used_tables, True)
+
+
+def compile_bidding_file(board_tables, output_format):
+    """
+    Compile bidding-data file content from all bidding tables of a board.
+
+    Tables are stored as rendered (JSON of call codes for compact
+    and binary formats), by pair numbers.
+    """
+    if output_format in ['compact', 'binary']:
+        board_tables = dict([
+            (pair_numbers, json.loads(bidding_table))
+            for (pair_numbers, bidding_table) in board_tables.iteritems()])
+    if output_format == 'binary':
+        return pack_bidding(board_tables)
+    return json.dumps(board_tables, sort_keys=True)
+
+
+def write_changed_file(file_path, content, exists=True):
+    """
+    Write (binary) file content, unless the file has it already.
+
+    Returns False if the file was not written.
+    """
+    if exists:
+        try:
+            with file(file_path, 'rb') as current_file:
+                if current_file.read() == content:
+                    return False
+        except IOError:
+            pass
+    with file(file_path, 'wb') as output_file:
+        output_file.write(content)
+    return True
+
+
+def setup_worker_logging(log_level, log_file):
+    """
+    Configure logging in traveller worker process.
+
+    Processes spawned (not forked) start without any logging set up.
+    """
+    if not len(log.getLogger().handlers) and log_file is not None:
+        log.basicConfig(
+            level=log_level,
+            format='%(asctime)s %(levelname)-8s %(name)-8s %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S',
+            filename=log_file)
+
+
+def write_traveller_files(task):
+    """
+    Write all files for a single traveller, see JFRBidding.write_travellers.
+
+    Returns paths of files written, paths of files which already had
+    their content, pair numbers of linked bidding tables and hashes
+    of all files, taken before they were written (if requested).
+    """
+    (tournament_file, bidding_file, board_text_path, pair_tables,
+     board_lineups, compressed_file_path, output_format, hash_files) = task
+    written_files = []
+    unchanged_files = []
+    file_hashes = {}
+
+    def register_file(file_path, written):
+        """Sort file into written or unchanged ones."""
+        (written_files if written else unchanged_files).append(file_path)
+
+    for file_path in [tournament_file, board_text_path, compressed_file_path]:
+        if hash_files and file_path is not None:
+            file_hashes[file_path] = hash_file(file_path)
+    log.getLogger('scripts').info('writing scripts into: %s', tournament_file)
+    register_file(tournament_file,
+                  write_traveller_scripts(tournament_file, bidding_file))
+    used_tables = []
+    if board_text_path is not None:
+        log.getLogger('links').info('writing traveller: %s', board_text_path)
+        (used_tables, written) = write_traveller_links(
+            board_text_path, pair_tables, board_lineups)
+        register_file(board_text_path, written)
+    if compressed_file_path is not None:
+        used_tables_set = set(used_tables)
+        board_tables = dict([
+            (pair_numbers, bidding_table)
+            for (pair_numbers, bidding_table) in pair_tables.iteritems()
+            if pair_numbers in used_tables_set])
+        log.getLogger('compress').info(
+            'writing compressed file %s (%d bidding tables)',
+            compressed_file_path, len(board_tables))
+        register_file(compressed_file_path,
+                      write_changed_file(
+                          compressed_file_path,
+                          compile_bidding_file(board_tables, output_format)))
+    return (written_files, unchanged_files, used_tables, file_hashes)
+
+
 class JFRBidding(object):
     """Bidding data converter (from BWS data to JFR HTML pages)."""
 
@@ -178,7 +1185,8 @@ class JFRBidding(object):
 
     def __store_file_hash(self, file_path):
         if self.__goniec['host'] is not None:
-            self.__goniec['file_hashes'][file_path] = hash_file(file_path)
+            self.__goniec['file_hashes'][file_path] = hash_file(file_path) \
+                if self.__directory.isfile(file_path) else None
 
     def __detect_changed_files(self):
         changed_paths = []
@@ -189,10 +1197,48 @@ class JFRBidding(object):
                 log.getLogger('hash').debug('file not changed: %s', file_path)
         return changed_paths
 
+    def __render_bidding(self, board_no, auction, output_format=None):
+        """
+        Compile bidding table for an auction.
+
+        Table is compiled in output format of the instance,
+        unless other format is explicitly requested.
+        """
+        dealer = get_dealer(auction)
+        log.getLogger('tables').debug(
+            'board %s: %d bids, dealer %s',
+            board_no, len(auction), dealer)
+        last_bidder = get_last_bidder(auction)
+        bidding_table = self.__compile_bidding(auction)
+        bidding_table = self.__form_bidding(
+            bidding_table, dealer, last_bidder)
+        log.getLogger('tables').debug(
+            'compiled into %d rounds of bidding',
+            len(bidding_table))
+        if (output_format or self.__output_format) in ['compact', 'binary']:
+            return json.dumps(compact_bidding(bidding_table))
+        return self.__format_bidding(bidding_table)
+
     def __format_bidding(self, bidding):
-        """Convert bidding data to properly formatted HTML table."""
+        """
+        Convert bidding data to properly formatted HTML table.
+
+        In verification mode, table is also built with BeautifulSoup
+        and the latter is used if the two differ.
+        """
         log.getLogger('b_format').debug('formatting bidding: %s', bidding)
-        bid_match = re.compile(r'(\d)([SHDCN])')
+        html_table = render_bidding(bidding, self.__directions)
+        if self.__verify_rendering:
+            dom_table = self.__format_bidding_dom(bidding)
+            if dom_table != html_table:
+                log.getLogger('b_format').warning(
+                    'rendered bidding table differs from DOM: %s, %s',
+                    html_table, dom_table)
+                return dom_table
+        return html_table
+
+    def __format_bidding_dom(self, bidding):
+        """Convert bidding data to HTML table, using BeautifulSoup."""
         html_output = bs4('<table>', 'lxml')
         header_row = html_output.new_tag('tr')
         html_output.table.append(header_row)
@@ -205,7 +1251,7 @@ class JFRBidding(object):
             html_output.table.append(bidding_row)
             for bid in bid_round:
                 bid_cell = html_output.new_tag('td')
-                call_match = re.match(bid_match, bid)
+                call_match = CALL_PATTERN.match(bid)
                 if call_match:
                     bid_cell.append(call_match.group(1))
                     bid_icon = html_output.new_tag(
@@ -216,7 +1262,6 @@ class JFRBidding(object):
                         bid = '( - )'
                     bid_cell.append(bid)
                 bidding_row.append(bid_cell)
-            log.getLogger('b_format').debug('%5s' * 4, *bid_round)
         return unicode(html_output.table)
 
     def __get_bidding_file_output_path(self,
@@ -229,13 +1274,15 @@ class JFRBidding(object):
 
         Path format: {prefix}_bidding_{jfr_board_number}_{pair_numbers}.txt
         Compressed path format: {prefix}_bidding_{jfr_board_number}.json
+        (or .bin, for packed binary format)
         """
         if compressed:
             return path.join(
                 path.dirname(self.__tournament_prefix),
                 'bidding-data',
-                u'{0}_bidding_{1:03}.json'.format(
-                    path.basename(self.__tournament_prefix), board_no))
+                u'{0}_bidding_{1:03}.{2}'.format(
+                    path.basename(self.__tournament_prefix), board_no,
+                    'bin' if self.__output_format == 'binary' else 'json'))
         else:
             if pair_numbers is None:
                 # read numbers from lineup
@@ -245,59 +1292,279 @@ class JFRBidding(object):
                 self.__tournament_prefix, board_no,
                 '_'.join([str(num) for num in pair_numbers]))
 
+    def __skip_unchanged_file(self, file_path):
+        """Register a file which would be written with its own content."""
+        log.getLogger('files').info('file not changed, skipping: %s',
+                                    file_path)
+        self.__unchanged_files.append(file_path)
+
+    def __write_changed_file(self, file_path, content):
+        """Write (binary) file content, unless the file has it already."""
+        if write_changed_file(file_path, content,
+                              self.__directory.isfile(file_path)):
+            self.__directory.update(file_path)
+        else:
+            self.__skip_unchanged_file(file_path)
+
+    def __create_output_directory(self):
+        """
+        Make sure directory for compressed bidding files exists.
+
+        Returns False if it cannot be created.
+        """
+        output_directory = path.join(
+            path.dirname(self.__tournament_prefix),
+            'bidding-data'
+        )
+        if not self.__directory.exists(output_directory):
+            try:
+                mkdir(output_directory)
+                self.__directory.update(output_directory, is_dir=True)
+            except OSError:
+                log.getLogger('compress').error(
+                    'unable to create directory for bidding-data: %s',
+                    output_directory)
+                return False
+        return True
+
+    def __get_state_file_path(self):
+        """
+        Compile file path for bidding state of incremental runs.
+
+        Path format: {prefix}_bidding_state.json
+        """
+        return u'{0}_bidding_state.json'.format(self.__tournament_prefix)
+
+    def __get_mapping_cache_path(self):
+        """
+        Compile file path for board number mapping cache.
+
+        Path format: {prefix}_bidding_mapping.json
+        """
+        return u'{0}_bidding_mapping.json'.format(self.__tournament_prefix)
+
+    def __store_bidding_state(self, state):
+        """Write parsed bidding and BWS watermarks to JSON state file."""
+        state_path = self.__get_state_file_path()
+        try:
+            with file(state_path, 'w') as state_file:
+                json.dump(state, state_file,
+                          default=lambda auction: auction.to_dict())
+            log.getLogger('state').info(
+                'bidding state written to %s (last bid ID: %d)',
+                state_path, state['watermark']['BiddingData'])
+        except IOError as ex:
+            log.getLogger('state').warning(
+                'unable to write bidding state to %s: %s', state_path, ex)
+
+    def __read_bws_data(self, bws_file, section_number, max_round,
+                        incremental, source_type, source_filter, snapshot):
+        """Read and parse lineups and bidding from BWS."""
+        if max_round == 0:
+            max_round = sys.maxint
+        state_criteria = {'bws_file': path.realpath(bws_file),
+                          'section': section_number,
+                          'max_round': max_round}
+        state = None
+        if incremental:
+            state = load_bidding_state(self.__get_state_file_path())
+            if state is not None and \
+               state.get('criteria') != state_criteria:
+                log.getLogger('state').info(
+                    'bidding state criteria changed, ignoring state')
+                state = None
+        log.getLogger('init').debug('reading BWS file: %s', bws_file)
+        # BWS rows are parsed as they are read, without storing them
+        with get_data_source(bws_file, source_type,
+                             section_number, max_round,
+                             snapshot) as data_source:
+            log.getLogger('init').debug('parsing lineup data')
+            (self.__round_lineups, self.__board_ranges) = parse_round_data(
+                data_source.get_round_data())
+            if incremental or not source_filter:
+                erased = parse_erased_boards(
+                    data_source.get_erased_boards())
+            else:
+                erased = {}
+            # result erasures invalidate calls parsed in previous runs,
+            # so any new erasure forces reading entire bidding
+            erased_watermark = [max(erased.values() or [0]), len(erased)]
+            if state is not None and \
+               state['watermark']['ReceivedData'] != erased_watermark:
+                log.getLogger('state').info(
+                    'new result erasures found, ignoring state')
+                state = None
+            # BWS file replaced at the same path does not have
+            # the row with watermark ID (or has a different one)
+            if state is not None and \
+               state['watermark'].get('BiddingEntry') != get_bid_identity(
+                   data_source.get_bidding_entry(
+                       state['watermark']['BiddingData'])):
+                log.getLogger('state').info(
+                    'bidding data replaced, ignoring state')
+                state = None
+            self.__bid_count = 0
+            if state is not None:
+                self.__bid_watermark = state['watermark']['BiddingData']
+                self.__bid_watermark_entry = \
+                    state['watermark']['BiddingEntry']
+                log.getLogger('state').info(
+                    'reading bidding data newer than ID %d',
+                    self.__bid_watermark)
+            else:
+                self.__bid_watermark = 0
+                self.__bid_watermark_entry = None
+            log.getLogger('init').debug('parsing bidding data')
+            self.__bids = parse_bidding_data(
+                self.__count_bids(
+                    data_source.get_bidding_data(self.__bid_watermark,
+                                                 source_filter)),
+                None if source_filter else erased,
+                state['bids'] if state is not None else None)
+        log.getLogger('init').debug(
+            'parsed %d board ranges, %d bidding entries',
+            len(self.__board_ranges), self.__bid_count)
+        if incremental:
+            self.__store_bidding_state({
+                'criteria': state_criteria,
+                'watermark': {
+                    'BiddingData': self.__bid_watermark,
+                    'BiddingEntry': self.__bid_watermark_entry,
+                    'ReceivedData': erased_watermark
+                },
+                'bids': {str(board_no): auction
+                         for board_no, auction in self.__bids.iteritems()}
+            })
+
+    def __count_bids(self, bid_data):
+        """Pass BiddingData rows through, tracking their count and max ID."""
+        for bid in bid_data:
+            self.__bid_count += 1
+            if bid.id > self.__bid_watermark:
+                self.__bid_watermark = bid.id
+                self.__bid_watermark_entry = get_bid_identity(bid)
+            yield bid
+
     def __map_board_numbers(self):
         """
         Map BWS board numbers to JFR board numbers.
 
         Filters boards to these present in both sets of data.
         """
-        self.__tournament_files = [
-            f for f
-            in glob.glob(self.__tournament_prefix + '*.html')
-            if re.search(self.__tournament_files_match, f)]
+        # board files by their three-digit number
+        board_files = {}
+        for board_file in self.__directory.glob(
+                self.__tournament_prefix + '*.html'):
+            board_match = re.search(self.__tournament_files_match, board_file)
+            if board_match:
+                board_files.setdefault(
+                    board_match.group(1), []).append(board_file)
         log.getLogger('b_map').debug('found %d possible board files to map',
-                                     len(self.__tournament_files))
+                                     sum([len(files) for files
+                                          in board_files.itervalues()]))
+        # mapping depends only on RoundData and the board files found
+        cache_key = hashlib.md5(json.dumps([
+            sorted([list(round_data) for round_data in self.__board_ranges]),
+            sorted(board_files.items())])).hexdigest()
+        if not self.__load_board_mapping(cache_key):
+            self.__compile_board_mapping(board_files)
+            self.__store_board_mapping(cache_key)
+        # lineups of BWS boards for each JFR board, for individual events
+        self.__board_lineups = {}
+        for b_number, jfr_number in self.__board_number_mapping.iteritems():
+            if jfr_number is not None:
+                lineup = self.__round_lineups.get(
+                    b_number.round, {}).get(b_number.table_key)
+                if lineup is not None:
+                    self.__board_lineups.setdefault(jfr_number, []).append(
+                        (frozenset(lineup), lineup))
+
+    def __compile_board_mapping(self, board_files):
+        """Compile board number mapping from RoundData board ranges."""
         self.__board_number_mapping.clear()
-        for round_data in self.__lineup_data:
+        for round_data in self.__board_ranges:
             log.getLogger('b_map').debug('round data: %s', round_data)
-            # 13th column has JFR number for the first board
-            if len(round_data) > 12:
-                jfr_number = round_data[12]
-                round_no = round_data[2]
-                sector_no = round_data[0]
-                table_no = round_data[1]
-                if jfr_number and round_no:
-                    # 5th and 6th - actual board number
-                    for board_number in range(int(round_data[5]),
-                                              int(round_data[6])+1):
-                        board_string = '_'.join([
-                            str(board_number),
-                            str(round_no),
-                            str(sector_no),
-                            str(table_no)])
-                        board_no = jfr_number + board_number - round_data[5]
-                        self.__board_number_mapping[
-                            board_string
-                        ] = board_no
-                        log.getLogger('b_map').debug('mapping %s -> %d',
-                                                     board_string,
-                                                     board_no)
+            if round_data.jfr_board and round_data.round:
+                for board_number in range(int(round_data.low_board),
+                                          int(round_data.high_board)+1):
+                    board_key = BoardKey(board_number,
+                                         round_data.round,
+                                         round_data.section,
+                                         round_data.table)
+                    board_no = round_data.jfr_board + board_number \
+                        - round_data.low_board
+                    self.__board_number_mapping[board_key] = board_no
+                    log.getLogger('b_map').debug('mapping %s -> %d',
+                                                 board_key,
+                                                 board_no)
         # only include these board numbers from mapping
         # which actually exist in JFR output
-        custom_files = []
+        custom_files = {}
         for b_number, jfr_number in self.__board_number_mapping.iteritems():
-            board_files = [
-                f for f
-                in self.__tournament_files
-                if f.endswith('{0:03}.html'.format(jfr_number))]
-            if len(board_files):
-                custom_files = custom_files + board_files
+            board_number = '{0:03}'.format(jfr_number)
+            if board_number in board_files:
+                custom_files[board_number] = board_files[board_number]
             else:
                 self.__board_number_mapping[b_number] = None
                 log.getLogger('b_map').debug(
                     'board %s -> %d not in board files, ignoring',
                     b_number, jfr_number)
-        self.__tournament_files = list(set(custom_files))
+        self.__tournament_files = [
+            board_file for files in custom_files.itervalues()
+            for board_file in files]
+
+    def __load_board_mapping(self, cache_key):
+        """
+        Read board number mapping and board files from mapping cache.
+
+        Returns False if the cache is missing or compiled for other input.
+        """
+        cache_path = self.__get_mapping_cache_path()
+        if not self.__directory.isfile(cache_path):
+            log.getLogger('b_map').info(
+                'board mapping cache %s does not exist', cache_path)
+            return False
+        try:
+            with file(cache_path) as cache_file:
+                cache = json.load(cache_file)
+            if cache['key'] != cache_key:
+                log.getLogger('b_map').info(
+                    'RoundData or board files changed, mapping boards')
+                return False
+            self.__board_number_mapping.clear()
+            for mapping in cache['mapping']:
+                self.__board_number_mapping[BoardKey(*mapping[0:4])] = \
+                    mapping[4]
+            self.__tournament_files = cache['files']
+        except (IOError, ValueError, KeyError, TypeError) as ex:
+            log.getLogger('b_map').warning(
+                'unable to read board mapping cache from %s: %s',
+                cache_path, ex)
+            return False
+        log.getLogger('b_map').info(
+            'board mapping read from %s', cache_path)
+        return True
+
+    def __store_board_mapping(self, cache_key):
+        """Write board number mapping and board files to mapping cache."""
+        cache_path = self.__get_mapping_cache_path()
+        try:
+            with file(cache_path, 'w') as cache_file:
+                json.dump({
+                    'key': cache_key,
+                    'mapping': [
+                        list(b_number) + [jfr_number]
+                        for b_number, jfr_number
+                        in self.__board_number_mapping.iteritems()],
+                    'files': self.__tournament_files
+                }, cache_file)
+            self.__directory.update(cache_path)
+            log.getLogger('b_map').info(
+                'board mapping written to %s', cache_path)
+        except IOError as ex:
+            log.getLogger('b_map').warning(
+                'unable to write board mapping cache to %s: %s',
+                cache_path, ex)
 
     def __compile_bidding(self, bidding):
         """Compile two-dimensional bidding table from a list of calls."""
@@ -328,126 +1595,10 @@ class JFRBidding(object):
         # aligning it row-by-row (bid round-by-round)
         return [list(row) for row in zip(*bidding_table)]
 
-    def __get_individual_pair_numbers(self, pair_numbers, board_number):
-        """
-        Filter participant numbers.
-
-        Match numbers specified in round data.
-        """
-        bws_boards = []
-        for bws_board in self.__board_number_mapping:
-            if self.__board_number_mapping[bws_board] == board_number:
-                bws_boards.append(bws_board.split('_')[1:])
-        for table in bws_boards:
-            lineup = self.__round_lineups[int(table[0])]['_'.join(table[1:])]
-            if set(lineup).issubset(set(pair_numbers)):
-                return lineup
-        return pair_numbers
-
-    def __write_bidding_file(self, board_text_path, file_number):
-        """Alter traveller file to include links to bidding tables."""
-        self.__store_file_hash(board_text_path)
-        with file(board_text_path, 'r+') as board_text:
-            board_text_content = bs4(
-                board_text, 'lxml')
-            used_files = []
-            for row in board_text_content.select('tr'):
-                cells = row.select('td')
-                log.getLogger('links').debug(
-                    'row: %s',
-                    ' '.join([
-                        ''.join([
-                            cc for cc
-                            in c.contents if isinstance(cc, basestring)
-                        ]).strip()
-                        for c in cells]))
-                # traveller table rows for specific score entries
-                # should have 11 cells
-                if len(cells) == 11:
-                    try:
-                        pair_numbers = sorted([
-                            int(cell) for cell in
-                            cells[1].contents[0].split('-') \
-                            + cells[2].contents[0].split('-')
-                        ])
-                        log.getLogger('links').debug(
-                            'pairs: %s', pair_numbers)
-                        if len(pair_numbers) > 2:
-                            # individual event
-                            # must determine which numbers are in round data
-                            mapped_numbers = self.__get_individual_pair_numbers(
-                                pair_numbers, int(file_number, 10))
-                            log.getLogger('links').info(
-                                'individual contestant numbers %s mapped ' \
-                                + 'to BWS pair numbers: %s',
-                                pair_numbers, mapped_numbers)
-                            pair_numbers = mapped_numbers
-                    except ValueError:
-                        log.getLogger('links').debug(
-                            'invalid pair numbers, skipping')
-                        continue
-                    bidding_link = board_text_content.new_tag(
-                        'a', href='#', **{'class': 'biddingLink'})
-                    bidding_link.string = ' '
-                    bidding_path = self.__get_bidding_file_output_path(
-                        int(file_number, 10),
-                        pair_numbers=pair_numbers)
-                    bidding_link['data-bidding-link'] = '_'.join(
-                        [str(pair) for pair in pair_numbers])
-                    # only append link if we've got bidding data
-                    if isfile(bidding_path):
-                        if bidding_path in self.__bidding_files:
-                            used_files.append(bidding_path)
-                        log.getLogger('links').info(
-                            'linking: %s',
-                            bidding_link['data-bidding-link'])
-                        # fourth cell is the contract
-                        for link in cells[3].select('a.biddingLink'):
-                            log.getLogger('links').debug(
-                                'removing existing link')
-                            link.extract()
-                        cells[3].append(bidding_link)
-                    else:
-                        log.getLogger('links').warning(
-                            'bidding for file path %s not found',
-                            bidding_link['data-bidding-link'])
-                else:
-                    log.getLogger('links').debug('skipping row')
-            board_text.seek(0)
-            board_text.write(board_text_content.table.prettify(
-                'utf-8', formatter='html'))
-            board_text.truncate()
-            return used_files
-
-    def __link_compressed_bidding_file(self, traveller_file, bidding_file):
-        """Put <link> markup for compressed bidding file in a traveller."""
-        if traveller_file in self.__tournament_files:
-            with file(traveller_file, 'r+') as traveller_html:
-                traveller = bs4(traveller_html, 'lxml')
-                for link in traveller.findAll('link', rel='bidding-file'):
-                    link.extract()
-                bidding_scripts = filter_scripts(
-                    traveller.select('head script'), 'javas/bidding.js')
-                if len(bidding_scripts) < 0:
-                    log.getLogger('compress').warning(
-                        'traveller file %s lacks bidding JavaScript, skipping',
-                        traveller_file)
-                else:
-                    bidding_data_tag = traveller.new_tag('link')
-                    bidding_data_tag['rel'] = 'bidding-file'
-                    bidding_data_tag['src'] = path.relpath(
-                        bidding_file, path.dirname(traveller_file)
-                    ).replace(sep, '/')
-                    bidding_scripts[0].insert_after(bidding_data_tag)
-                    traveller_html.seek(0)
-                    traveller_html.write(traveller.prettify(
-                        'utf-8', formatter='html'))
-        else:
-            log.getLogger('compress').warning(
-                'traveller file %s not registered, skipping', traveller_file)
-
     # sitting read from BWS
     __round_lineups = {}
+    # round data read from BWS, with board number ranges to map
+    __board_ranges = []
     # bidding read from BWS
     __bids = {}
 
@@ -458,43 +1609,62 @@ class JFRBidding(object):
     # matched files, including board number mapping boundaries
     __tournament_files = []
 
+    # tournament directory listing, shared by the whole run
+    __directory = None
+
     # BWS number -> JFR number mapping
     __board_number_mapping = {}
+    # JFR number -> lineups of BWS boards mapped to it
+    __board_lineups = {}
 
     # all generated bidding table files, for cleanup purposes
     __bidding_files = []
+    # files not written, as they already had the content
+    __unchanged_files = []
+    # bidding table file path -> (JFR board, pair numbers, rendered table)
+    __bidding_tables = {}
+    # write bidding tables to files as well (legacy layout)
+    __write_tables = False
+
+    # build bidding tables with BeautifulSoup as well, to compare them
+    __verify_rendering = False
+    # rendered HTML of recent auctions
+    __render_cache = None
+    # bidding-data file format, see OUTPUT_FORMATS
+    __output_format = 'html'
+
+    # number of bidding entries read from BWS and the highest ID among them
+    __bid_count = 0
+    __bid_watermark = 0
+    # identity of the bidding entry with the highest ID, see get_bid_identity
+    __bid_watermark_entry = None
 
     # configuration for Goniec
     __goniec = {'host': None, 'port': None,
                 'file_hashes': {}, 'force_resend': False}
 
     def __init__(self, bws_file, file_prefix,
-                 section_number=0, max_round=0):
-        """Construct parser object."""
-        log.getLogger('init').debug('reading BWS file: %s', bws_file)
-        with pypyodbc.win_connect_mdb(bws_file) as connection:
-            cursor = connection.cursor()
-            if max_round == 0:
-                max_round = sys.maxint
-            criteria_string = ' WHERE '
-            criteria_string += 'Section = %d' % section_number \
-                               if section_number > 0 else '1 = 1'
-            criteria_string += ' AND Round <= %d' % max_round
-            self.__lineup_data = cursor.execute(
-                'SELECT * FROM RoundData' + criteria_string
-            ).fetchall()
-            bid_data = cursor.execute(
-                'SELECT * FROM BiddingData' + criteria_string
-            ).fetchall()
-            erased_boards = cursor.execute(
-                'SELECT * FROM ReceivedData ' + criteria_string + ' AND Erased'
-            ).fetchall()
-        log.getLogger('init').debug('parsing lineup data (%d entries)',
-                                    len(self.__lineup_data))
-        self.__round_lineups = parse_lineup_data(self.__lineup_data)
-        log.getLogger('init').debug('parsing bidding data (%d entries)',
-                                    len(bid_data))
-        self.__bids = parse_bidding_data(bid_data, erased_boards)
+                 section_number=0, max_round=0, incremental=False,
+                 source_type=None, source_filter=False, snapshot=False,
+                 bws_data=None, directory=None, verify_rendering=False,
+                 output_format='html', write_tables=False):
+        """
+        Construct parser object.
+
+        BWS data is read from BWS file or its export, see get_data_source,
+        unless it's provided already parsed (see read_bws_sections).
+        Calls from erased boards are skipped either while parsing,
+        or by the data source itself (if source_filter is set).
+        BWS file can be read from its snapshot copy, not to hold
+        the file while it's being written to by Bridgemate software
+        (the copy may be shared with other objects of the same run).
+        Tournament files are looked up in directory snapshot, which may
+        be shared with other objects of the same run.
+        Bidding tables can be verified against BeautifulSoup output.
+        Bidding-data files hold either rendered HTML tables or call codes
+        (see OUTPUT_FORMATS). Separate files with bidding tables are only
+        written if requested.
+        """
         log.getLogger('init').debug('parsing prefix, filename = %s',
                                     file_prefix)
         self.__tournament_prefix = path.splitext(
@@ -504,6 +1674,25 @@ class JFRBidding(object):
             re.escape(self.__tournament_prefix) + r'([0-9]{3})\.html')
         log.getLogger('init').debug('tournament files pattern: %s',
                                     self.__tournament_files_match.pattern)
+        self.__directory = directory if directory is not None \
+            else DirectorySnapshot()
+        self.__verify_rendering = verify_rendering
+        self.__render_cache = RenderCache()
+        self.__output_format = output_format
+        self.__write_tables = write_tables
+        self.__bidding_tables = {}
+        self.__unchanged_files = []
+        self.__board_number_mapping = {}
+        self.__goniec = {'host': None, 'port': None,
+                         'file_hashes': {}, 'force_resend': False}
+        if bws_data is not None:
+            (self.__round_lineups,
+             self.__board_ranges,
+             self.__bids) = bws_data
+        else:
+            self.__read_bws_data(bws_file, section_number, max_round,
+                                 incremental, source_type,
+                                 source_filter, snapshot)
         self.__map_board_numbers()
 
     def setup_goniec(self, goniec_setup=None, goniec_force=False):
@@ -517,150 +1706,172 @@ class JFRBidding(object):
             self.__goniec['force_resend'] = goniec_force
 
     def write_bidding_tables(self):
-        """Iterate over bidding and writes tables to HTML files."""
+        """
+        Iterate over bidding and compile bidding tables.
+
+        Tables are written to HTML files only for legacy layout.
+        """
         self.__bidding_files = []
-        for board_no, board_data in self.__bids.items():
+        self.__bidding_tables = {}
+        for board_no, round_data in self.__bids.items():
             if board_no in self.__board_number_mapping:
-                for table_no, table_data in board_data.items():
-                    for round_no, round_data in table_data.items():
-                        if round_no in self.__round_lineups:
-                            if table_no in self.__round_lineups[round_no]:
-                                dealer = get_dealer(round_data)
-                                log.getLogger('tables').debug(
-                                    'board %s: %d bids, dealer %s',
-                                    board_no, len(round_data), dealer)
-                                last_bidder = get_last_bidder(round_data)
-                                bidding_table = self.__compile_bidding(
-                                    round_data)
-                                bidding_table = self.__form_bidding(
-                                    bidding_table, dealer, last_bidder)
-                                log.getLogger('tables').debug(
-                                    'compiled into %d rounds of bidding',
-                                    len(bidding_table))
-                                bidding_fpath = \
-                                    self.__get_bidding_file_output_path(
-                                        self.__board_number_mapping[board_no],
-                                        position_info=(round_no, table_no))
-                                self.__bidding_files.append(bidding_fpath)
-                                self.__store_file_hash(bidding_fpath)
-                                with file(bidding_fpath, 'w') as bidding_file:
-                                    bidding_file.write(
-                                        self.__format_bidding(bidding_table))
-                                log.getLogger('tables').info(
-                                    'written bidding table to %s',
-                                    bidding_fpath)
-                            else:
-                                log.getLogger('tables').info(
-                                    'lineup for table %s, round %s not found',
-                                    table_no, round_no)
+                round_no = board_no.round
+                table_no = board_no.table_key
+                if round_no in self.__round_lineups:
+                    if table_no in self.__round_lineups[round_no]:
+                        bidding_html = self.__render_cache.get(
+                            round_data.get_key())
+                        if bidding_html is None:
+                            bidding_html = self.__render_bidding(
+                                board_no, round_data)
+                            self.__render_cache.put(
+                                round_data.get_key(), bidding_html)
+                        else:
+                            log.getLogger('tables').debug(
+                                'board %s: same bidding already rendered',
+                                board_no)
+                        pair_numbers = self.__round_lineups[round_no][table_no]
+                        bidding_fpath = self.__get_bidding_file_output_path(
+                            self.__board_number_mapping[board_no],
+                            pair_numbers=pair_numbers)
+                        self.__bidding_files.append(bidding_fpath)
+                        self.__bidding_tables[bidding_fpath] = (
+                            self.__board_number_mapping[board_no],
+                            '_'.join([str(num) for num in pair_numbers]),
+                            bidding_html)
+                        if self.__write_tables:
+                            # legacy files are always HTML tables
+                            if self.__output_format != 'html':
+                                bidding_html = self.__render_bidding(
+                                    board_no, round_data, 'html')
+                            self.__store_file_hash(bidding_fpath)
+                            with file(bidding_fpath, 'w') as bidding_file:
+                                bidding_file.write(bidding_html)
+                            self.__directory.update(bidding_fpath)
+                            log.getLogger('tables').info(
+                                'written bidding table to %s', bidding_fpath)
                         else:
                             log.getLogger('tables').info(
-                                'lineup for round %s not found',
-                                round_no)
+                                'compiled bidding table for %s',
+                                bidding_fpath)
+                    else:
+                        log.getLogger('tables').info(
+                            'lineup for table %s-%s, round %s not found',
+                            table_no[0], table_no[1], round_no)
+                else:
+                    log.getLogger('tables').info(
+                        'lineup for round %s not found', round_no)
             else:
                 log.getLogger('tables').info('mapping for board %s not found',
                                              board_no)
+        log.getLogger('tables').info(
+            'bidding render cache: %d hits, %d misses',
+            self.__render_cache.hits, self.__render_cache.misses)
         return self.__bidding_files
 
+    def __get_bidding_data_link(self, tournament_file, board_number):
+        """Compile path of bidding-data file, relative to the traveller."""
+        return path.relpath(
+            self.__get_bidding_file_output_path(
+                board_number, compressed=True),
+            path.dirname(tournament_file)).replace(sep, '/')
+
+    def __drop_unused_tables(self, used_bidding_tables):
+        """Clean up bidding tables (and their files), which are not used."""
+        used_bidding_tables = set(used_bidding_tables)
+        for unused_file in [unused for unused
+                            in self.__bidding_files
+                            if unused not in used_bidding_tables]:
+            log.getLogger('links').warning(
+                'bidding table %s not used, skipping', unused_file)
+            self.__bidding_tables.pop(unused_file, None)
+            if self.__write_tables:
+                if self.__directory.exists(unused_file):
+                    remove(unused_file)
+                    self.__directory.remove(unused_file)
+                else:
+                    log.getLogger('links').warning(
+                        'bidding file %s does not exist', unused_file)
+
+    def __get_board_tables(self):
+        """Group bidding tables by JFR board, then by pair numbers."""
+        board_tables = {}
+        for (board_number, pair_numbers, bidding_table) \
+                in self.__bidding_tables.itervalues():
+            board_tables.setdefault(board_number, {})[pair_numbers] = \
+                bidding_table
+        return board_tables
+
     def write_bidding_scripts(self):
-        """Alter traveller files to include necessary JavaScript."""
+        """
+        Alter traveller files to include necessary JavaScript.
+
+        Travellers are linked to their compressed bidding files as well,
+        so that each traveller is read and written once.
+        """
+        link_bidding_files = self.__create_output_directory()
         for tournament_file in self.__tournament_files:
             log.getLogger('scripts').info('writing scripts into: %s',
                                           tournament_file)
             self.__store_file_hash(tournament_file)
-            with file(tournament_file, 'r+') as board_html:
-                board_content = bs4(board_html, 'lxml', from_encoding='utf-8')
-                header_scripts = board_content.select('head script')
-                # check for jQuery, append if necessary
-                jquery_scripts = filter_scripts(
-                    header_scripts, 'javas/jquery.js')
-                if not len(jquery_scripts):
-                    jquery = board_content.new_tag(
-                        'script', src='javas/jquery.js',
-                        type='text/javascript')
-                    jquery_scripts.append(jquery)
-                    board_content.head.append(jquery)
-                    log.getLogger('scripts').debug('jQuery not found, adding')
-                # check for bidding.js
-                bidding_scripts = filter_scripts(
-                    header_scripts, 'javas/bidding.js')
-                log.getLogger('scripts').debug('found %d bidding.js scripts',
-                                               len(bidding_scripts))
-                # and make sure bidding.js is appended after jQuery
-                for script in bidding_scripts:
-                    script.extract()
-                bidding_script = board_content.new_tag(
-                    'script', src='javas/bidding.js',
-                    type='text/javascript')
-                jquery_scripts[0].insert_after(bidding_script)
-                # check for bidding.css
-                bidding_styles = [css for css in
-                                  board_content.find_all(
-                                      'link',
-                                      rel='stylesheet',
-                                      href='css/bidding.css')]
-                log.getLogger('scripts').debug('found %d bidding.css sheets',
-                                               len(bidding_styles))
-                # add if none exist
-                if len(bidding_styles) == 0:
-                    bidding_style = board_content.new_tag(
-                        'link', rel='stylesheet',
-                        href='css/bidding.css')
-                    board_content.head.append(bidding_style)
-                board_html.seek(0)
-                board_html.write(board_content.prettify(
-                    'utf-8', formatter='html'))
-                board_html.truncate()
+            bidding_file = None
+            if link_bidding_files:
+                bidding_file = self.__get_bidding_data_link(
+                    tournament_file,
+                    int(re.match(self.__tournament_files_match,
+                                 tournament_file).group(1), 10))
+            if write_traveller_scripts(tournament_file, bidding_file):
+                self.__directory.update(tournament_file)
+            else:
+                self.__skip_unchanged_file(tournament_file)
         return self.__tournament_files
 
     def write_bidding_links(self):
         """
         Iterate over traveller files to include links to bidding tables.
 
-        Cleans up bidding table files, which are not used.
+        Cleans up bidding tables (and their files), which are not used.
         """
+        board_tables = self.__get_board_tables()
         used_bidding_tables = []
         used_board_files = []
         for tournament_file in self.__tournament_files:
             file_number = re.match(
                 self.__tournament_files_match,
                 tournament_file).group(1)
+            board_number = int(file_number, 10)
             board_text_path = path.splitext(tournament_file)[0] + '.txt'
-            if path.exists(board_text_path):
+            if self.__directory.exists(board_text_path):
                 log.getLogger('links').info(
                     'writing traveller for board %s: %s',
                     file_number, board_text_path)
-                used_bidding_tables = self.__write_bidding_file(
-                    board_text_path, file_number) + used_bidding_tables
+                self.__store_file_hash(board_text_path)
+                (used_tables, written) = write_traveller_links(
+                    board_text_path, board_tables.get(board_number, {}),
+                    self.__board_lineups.get(board_number, []))
+                if written:
+                    self.__directory.update(board_text_path)
+                else:
+                    self.__skip_unchanged_file(board_text_path)
+                used_bidding_tables = [
+                    self.__get_bidding_file_output_path(
+                        board_number, pair_numbers=pair_numbers.split('_'))
+                    for pair_numbers in used_tables] + used_bidding_tables
                 used_board_files.append(board_text_path)
                 log.getLogger('links').info('used board files: %s',
                                             ', '.join(used_bidding_tables))
-        for unused_file in [unused for unused
-                            in self.__bidding_files
-                            if unused not in used_bidding_tables]:
-            log.getLogger('links').warning(
-                'bidding file %s not used, deleting', unused_file)
-            if path.exists(unused_file):
-                remove(unused_file)
-            else:
-                log.getLogger('links').warning(
-                    'bidding file %s does not exist', unused_file)
+        self.__drop_unused_tables(used_bidding_tables)
         return used_board_files
 
     def compress_bidding_files(self):
-        """Compile all *.txt for a traveller into a single *.json file."""
-        output_directory = path.join(
-            path.dirname(self.__tournament_prefix),
-            'bidding-data'
-        )
-        if not path.exists(output_directory):
-            try:
-                mkdir(output_directory)
-            except OSError:
-                log.getLogger('compress').error(
-                    'unable to create directory for bidding-data: %s',
-                    output_directory)
-                return []
+        """
+        Compile all bidding tables for a traveller into a single file.
+
+        Travellers are linked to these files by write_bidding_scripts.
+        """
+        if not self.__create_output_directory():
+            return []
+        board_tables = self.__get_board_tables()
         compressed_files = []
         for traveller in self.__tournament_files:
             traveller_match = re.match(
@@ -670,32 +1881,90 @@ class JFRBidding(object):
                 compressed_file_path = self.__get_bidding_file_output_path(
                     board_number, compressed=True)
                 self.__store_file_hash(compressed_file_path)
-                board_file_prefix = path.basename(
-                    compressed_file_path).split('.')[0]
-                board_files = [filename for
-                               filename in self.__bidding_files
-                               if path.exists(filename) and
-                               path.basename(filename).startswith(
-                                   board_file_prefix)]
-                compressed_board = {}
-                for board_file in board_files:
-                    log.getLogger('compress').info(
-                        'compressing file %s', board_file)
-                    compressed_board[
-                        '_'.join(board_file.split('.')[-2].split('_')[-2:])
-                    ] = file(board_file).read()
+                compressed_board = board_tables.get(board_number, {})
                 log.getLogger('compress').info(
-                    'writing compressed file %s', compressed_file_path)
-                json.dump(compressed_board, file(compressed_file_path, 'w'))
-                for board_file in board_files:
-                    log.getLogger('compress').info(
-                        'removing file %s', board_file)
-                    remove(board_file)
+                    'writing compressed file %s (%d bidding tables)',
+                    compressed_file_path, len(compressed_board))
+                self.__write_changed_file(
+                    compressed_file_path,
+                    compile_bidding_file(compressed_board,
+                                         self.__output_format))
                 compressed_files.append(compressed_file_path)
-                self.__link_compressed_bidding_file(
-                    traveller, compressed_file_path)
         return compressed_files
 
+    def write_travellers(self, jobs):
+        """
+        Write scripts, links and bidding-data files with a process pool.
+
+        Equivalent of write_bidding_scripts, write_bidding_links
+        and compress_bidding_files, with all files of a single traveller
+        written by one worker process (see write_traveller_files).
+        Written files and file hashes are collected back in traveller order,
+        so that the results do not depend on the number of processes.
+        """
+        import multiprocessing
+
+        link_bidding_files = self.__create_output_directory()
+        board_tables = self.__get_board_tables()
+        tasks = []
+        for tournament_file in sorted(self.__tournament_files):
+            board_number = int(re.match(self.__tournament_files_match,
+                                        tournament_file).group(1), 10)
+            board_text_path = path.splitext(tournament_file)[0] + '.txt'
+            if not self.__directory.exists(board_text_path):
+                board_text_path = None
+            tasks.append((
+                tournament_file,
+                self.__get_bidding_data_link(tournament_file, board_number)
+                if link_bidding_files else None,
+                board_text_path,
+                board_tables.get(board_number, {}),
+                self.__board_lineups.get(board_number, []),
+                self.__get_bidding_file_output_path(
+                    board_number, compressed=True)
+                if link_bidding_files else None,
+                self.__output_format,
+                self.__goniec['host'] is not None))
+        log_files = [handler.baseFilename for handler
+                     in log.getLogger().handlers
+                     if isinstance(handler, log.FileHandler)]
+        log.getLogger('pool').info('writing %d travellers with %d processes',
+                                   len(tasks), jobs)
+        pool = multiprocessing.Pool(
+            jobs, initializer=setup_worker_logging,
+            initargs=(log.getLogger().level,
+                      log_files[0] if len(log_files) else None))
+        try:
+            results = pool.map(write_traveller_files, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+        # travellers, traveller text files, bidding-data files
+        all_files = ([], [], [])
+        used_bidding_tables = []
+        for (task, result) in zip(tasks, results):
+            (written_files, unchanged_files,
+             used_tables, file_hashes) = result
+            if self.__goniec['host'] is not None:
+                self.__goniec['file_hashes'].update(file_hashes)
+            for written_file in written_files:
+                self.__directory.update(written_file)
+            for unchanged_file in unchanged_files:
+                self.__skip_unchanged_file(unchanged_file)
+            board_number = int(re.match(self.__tournament_files_match,
+                                        task[0]).group(1), 10)
+            used_bidding_tables += [
+                self.__get_bidding_file_output_path(
+                    board_number, pair_numbers=pair_numbers.split('_'))
+                for pair_numbers in used_tables]
+            # files listed in the order of serial processing
+            for (files, file_path) in zip(all_files,
+                                          (task[0], task[2], task[5])):
+                if file_path is not None:
+                    files.append(file_path)
+        self.__drop_unused_tables(used_bidding_tables)
+        return sum(all_files, [])
+
     def send_changed_files(self, files_to_send):
         """Send specified files from working directory via Goniec."""
         if self.__goniec['host'] is not None:
@@ -705,7 +1974,7 @@ class JFRBidding(object):
             files_to_send = [file_to_send.replace(working_directory, '', 1)
                              for file_to_send in files_to_send
                              if file_to_send.startswith(working_directory) and
-                             path.exists(file_to_send) and
+                             self.__directory.exists(file_to_send) and
                              (file_to_send in changed_files or
                               self.__goniec['force_resend'])]
             if len(files_to_send) > 0:
@@ -734,6 +2003,151 @@ class JFRBidding(object):
             else:
                 log.getLogger('goniec').info('nothing to send')
 
+    def get_unchanged_files(self):
+        """Return files not written, as they already had their content."""
+        return self.__unchanged_files
+
+
+class JFRInputFingerprint(object):
+    """
+    Fingerprint of BWS data and tournament files, stored between runs.
+
+    Allows to detect runs which have nothing new to process.
+    BWS is checked with file size and modification time first and
+    only if these changed, tables are queried for row counts and IDs
+    (and RoundData rows are hashed).
+    Tournament files include bidding-data files written by the program.
+    """
+
+    def __init__(self, bws_file, file_prefix, parameters,
+                 source_type=None, section_number=0, max_round=0,
+                 directory=None, snapshot=False):
+        """
+        Construct fingerprint for specified input and run parameters.
+
+        BWS tables are read from a snapshot, if specified
+        (see get_data_source).
+        """
+        self.__bws_file = bws_file
+        self.__snapshot = snapshot
+        self.__directory = directory if directory is not None \
+            else DirectorySnapshot()
+        self.__source_type = source_type
+        self.__section_number = section_number
+        self.__max_round = max_round
+        self.__tournament_prefix = path.splitext(
+            path.realpath(file_prefix))[0]
+        self.__fingerprint = {'parameters': parameters}
+
+    def __get_fingerprint_path(self):
+        """
+        Compile file path for input fingerprint.
+
+        Path format: {prefix}_bidding_fingerprint.json
+        """
+        return u'{0}_bidding_fingerprint.json'.format(
+            self.__tournament_prefix)
+
+    def __get_bws_fingerprint(self):
+        if path.isdir(self.__bws_file):
+            return get_files_fingerprint(
+                glob.glob(path.join(self.__bws_file, '*')))
+        return get_files_fingerprint([self.__bws_file])
+
+    def __get_tournament_fingerprint(self):
+        # bidding-data files are included, so that removing them forces a run
+        return get_files_fingerprint(
+            self.__directory.glob(self.__tournament_prefix + '*.html') +
+            self.__directory.glob(self.__tournament_prefix + '*.txt') +
+            self.__directory.glob(path.join(
+                path.dirname(self.__tournament_prefix), 'bidding-data',
+                path.basename(self.__tournament_prefix) + '_bidding_*')),
+            self.__directory)
+
+    def __get_table_stats(self):
+        with get_data_source(self.__bws_file, self.__source_type,
+                             self.__section_number, self.__max_round,
+                             self.__snapshot) as data_source:
+            return data_source.get_table_stats()
+
+    def is_unchanged(self):
+        """Check if input has not changed since the fingerprint was stored."""
+        self.__fingerprint['bws'] = self.__get_bws_fingerprint()
+        self.__fingerprint['tournament'] = self.__get_tournament_fingerprint()
+        try:
+            with file(self.__get_fingerprint_path()) as fingerprint_file:
+                stored = json.load(fingerprint_file)
+        except (IOError, ValueError) as ex:
+            log.getLogger('fingerprint').info(
+                'stored input fingerprint not available: %s', ex)
+            stored = {}
+        for key in ['parameters', 'tournament']:
+            if stored.get(key) != self.__fingerprint[key]:
+                log.getLogger('fingerprint').info('%s changed', key)
+                self.__fingerprint['tables'] = self.__get_table_stats()
+                return False
+        if stored.get('bws') == self.__fingerprint['bws']:
+            self.__fingerprint['tables'] = stored.get('tables')
+            return True
+        # BWS file may be modified without any change in tables we read
+        self.__fingerprint['tables'] = self.__get_table_stats()
+        log.getLogger('fingerprint').debug(
+            'BWS table stats: %s', self.__fingerprint['tables'])
+        if stored.get('tables') == self.__fingerprint['tables']:
+            self.store(False)
+            return True
+        log.getLogger('fingerprint').info('BWS data changed')
+        return False
+
+    def store(self, refresh_tournament=True):
+        """
+        Write fingerprint to JSON file.
+
+        Tournament files are usually modified by the run itself,
+        so their fingerprint is refreshed before it's written.
+        """
+        if refresh_tournament:
+            self.__fingerprint['tournament'] = \
+                self.__get_tournament_fingerprint()
+        try:
+            with file(self.__get_fingerprint_path(), 'w') as fingerprint_file:
+                json.dump(self.__fingerprint, fingerprint_file)
+        except IOError as ex:
+            log.getLogger('fingerprint').warning(
+                'unable to write input fingerprint: %s', ex)
+
+
+def read_bws_sections(bws_file, section_numbers, max_round=0,
+                      source_type=None, source_filter=False, snapshot=False):
+    """
+    Read BWS data for multiple sections at once.
+
+    Returns lineups, board number ranges and bidding for each section,
+    as accepted by JFRBidding constructor.
+    """
+    log.getLogger('init').debug('reading BWS file for sections %s: %s',
+                                section_numbers, bws_file)
+    with get_data_source(bws_file, source_type,
+                         0, max_round, snapshot) as data_source:
+        (round_lineups, board_ranges) = parse_round_data(
+            data_source.get_round_data())
+        erased = None if source_filter \
+            else parse_erased_boards(data_source.get_erased_boards())
+        bids = parse_bidding_data(
+            data_source.get_bidding_data(0, source_filter), erased)
+    sections = {}
+    for section in section_numbers:
+        sections[section] = (
+            {round_no: {table_no: lineup
+                        for table_no, lineup in round_lineup.iteritems()
+                        if table_no[0] == section}
+             for round_no, round_lineup in round_lineups.iteritems()},
+            [board_range for board_range in board_ranges
+             if board_range.section == section],
+            {board_no: auction for board_no, auction in bids.iteritems()
+             if board_no.sector == section})
+    return sections
+
 
 def main():
     """Program entry point, invoked when __name__ is __main__."""
@@ -750,16 +2164,36 @@ def main():
         else:
             argument_parser.error('File %s does not exist' % filepath)
 
+    def data_path(datapath):
+        """Sanitize and validate BWS data paths (files or directories)."""
+        datapath = unicode(datapath, sys.getfilesystemencoding())
+        if path.exists(datapath):
+            return datapath
+        else:
+            argument_parser.error('Path %s does not exist' % datapath)
+
+    def section_path(sectionpath):
+        """Sanitize and validate section number and tournament path pairs."""
+        section_parts = sectionpath.split(':', 1)
+        # section 0 stands for all sections, it cannot be a partition
+        if len(section_parts) < 2 or not section_parts[0].isdigit() or \
+           int(section_parts[0]) < 1:
+            argument_parser.error(
+                'Invalid section specification: %s' % sectionpath)
+        return (int(section_parts[0]), file_path(section_parts[1]))
+
     argument_parser.add_argument('-V', '--version', action='version',
                                  version='%(prog)s {version}'.format(
                                      version=__version__))
 
     argument_parser.add_argument('bws_file', metavar='BWS_FILE',
-                                 help='path to BWS file',
-                                 type=file_path)
+                                 help='path to BWS file ' +
+                                 '(or to its SQLite/CSV export)',
+                                 type=data_path)
+
     argument_parser.add_argument('path', metavar='PATH',
                                  help='tournament path (to PREFIX.html)',
-                                 type=file_path)
+                                 type=file_path, nargs='?', default=None)
 
     console_output_args = argument_parser.add_mutually_exclusive_group()
     console_output_args.add_argument('-q', '--quiet', action='store_true',
@@ -789,7 +2223,71 @@ def main():
     argument_parser.add_argument('-mr', '--max-round', metavar='MAX_ROUND',
                                  help='max round number to read from',
                                  type=int, nargs='?', default=sys.maxint)
-    arguments = argument_parser.parse_args()
+    argument_parser.add_argument('-i', '--incremental', action='store_true',
+                                 help='read only bidding data added ' +
+                                 'since previous incremental run')
+    argument_parser.add_argument('-bs', '--bws-source', metavar='SOURCE',
+                                 help='BWS data source type ' +
+                                 '(default: detected from BWS_FILE)',
+                                 choices=sorted(SOURCE_TYPES.keys()),
+                                 default=None)
+    argument_parser.add_argument('-sf', '--source-filter', action='store_true',
+                                 help='skip bidding from erased boards ' +
+                                 'in BWS queries')
+    argument_parser.add_argument('-ss', '--snapshot', action='store_true',
+                                 help='read data from a copy of BWS file')
+    argument_parser.add_argument('-su', '--skip-unchanged',
+                                 action='store_true',
+                                 help='do nothing if BWS data and ' +
+                                 'tournament files did not change ' +
+                                 'since previous run')
+    argument_parser.add_argument('-ms', '--sections',
+                                 metavar='SECTION:PATH',
+                                 help='process multiple sections at once, ' +
+                                 'each with its own tournament path ' +
+                                 '(instead of PATH and SECTION)',
+                                 type=section_path, nargs='+', default=None)
+    argument_parser.add_argument('-vr', '--verify-rendering',
+                                 action='store_true',
+                                 help='compare bidding tables with ' +
+                                 'BeautifulSoup output (slow)')
+    argument_parser.add_argument('-of', '--output-format', metavar='FORMAT',
+                                 help='bidding-data file format: ' +
+                                 'HTML tables or call codes ' +
+                                 '(JSON or packed binary) ' +
+                                 'rendered in the browser',
+                                 choices=OUTPUT_FORMATS, default='html')
+    argument_parser.add_argument('-bt', '--bidding-tables',
+                                 action='store_true',
+                                 help='keep bidding tables in separate ' +
+                                 'files as well (legacy layout)')
+    argument_parser.add_argument('-j', '--jobs', metavar='JOBS',
+                                 help='number of processes writing ' +
+                                 'traveller files (default: 1)',
+                                 type=int, default=1)
+    # PATH is optional (not used with multiple sections), so argparse
+    # expects it right after BWS_FILE, PATH put after options is read here
+    (arguments, extra_arguments) = argument_parser.parse_known_args()
+    if len(extra_arguments):
+        if arguments.path is not None or len(extra_arguments) > 1 or \
+           extra_arguments[0].startswith('-'):
+            argument_parser.error(
+                'unrecognized arguments: %s' % ' '.join(extra_arguments))
+        arguments.path = file_path(extra_arguments[0])
+    if arguments.sections is None:
+        if arguments.path is None:
+            argument_parser.error('Tournament path is required')
+        sections = [(arguments.section_number, arguments.path)]
+    else:
+        if arguments.path is not None:
+            argument_parser.error(
+                'Tournament path cannot be used with multiple sections')
+        if arguments.incremental:
+            argument_parser.error(
+                'Incremental mode is not available for multiple sections')
+        sections = arguments.sections
+    if arguments.jobs < 1:
+        argument_parser.error('Number of processes must be positive')
 
     # primary logging facility - virtual_table.log file
     log.basicConfig(
@@ -809,28 +2307,87 @@ def main():
     log.info('-------- program started --------')
     log.debug('parsed arguments: %s', arguments)
 
+    # BWS file is copied once (if at all) for all the stages of the run
+    snapshot = BWSSnapshot(arguments.bws_file) if arguments.snapshot \
+        else False
     try:
-        bidding_parser = JFRBidding(
-            bws_file=arguments.bws_file,
-            file_prefix=arguments.path,
-            section_number=arguments.section_number,
-            max_round=arguments.max_round
-        )
-        bidding_parser.setup_goniec(
-            goniec_setup=arguments.send_files,
-            goniec_force=arguments.force_resend
-        )
-        bidding_parser.write_bidding_tables()
-        all_files = []
-        all_files += bidding_parser.write_bidding_scripts()
-        all_files += bidding_parser.write_bidding_links()
-        all_files += bidding_parser.compress_bidding_files()
-        bidding_parser.send_changed_files(all_files)
+        # tournament directories are listed once for the whole run
+        directory = DirectorySnapshot()
+        fingerprints = []
+        if arguments.skip_unchanged and not arguments.force_resend:
+            fingerprints = [
+                JFRInputFingerprint(
+                    arguments.bws_file, tournament_path,
+                    [section_number, arguments.max_round,
+                     arguments.incremental, arguments.bws_source,
+                     arguments.source_filter, arguments.output_format,
+                     arguments.bidding_tables, __version__],
+                    source_type=arguments.bws_source,
+                    section_number=section_number,
+                    max_round=arguments.max_round,
+                    directory=directory,
+                    snapshot=snapshot)
+                for section_number, tournament_path in sections]
+            # every fingerprint has to be checked, to be stored after the run
+            if all([fingerprint.is_unchanged()
+                    for fingerprint in fingerprints]):
+                log.info('nothing changed since previous run')
+                log.info('--------- program ended ---------')
+                return
+        if arguments.sections is not None:
+            section_data = read_bws_sections(
+                arguments.bws_file,
+                [section_number for section_number, _ in sections],
+                max_round=arguments.max_round,
+                source_type=arguments.bws_source,
+                source_filter=arguments.source_filter,
+                snapshot=snapshot)
+        else:
+            section_data = {}
+        for section_number, tournament_path in sections:
+            bidding_parser = JFRBidding(
+                bws_file=arguments.bws_file,
+                file_prefix=tournament_path,
+                section_number=section_number,
+                max_round=arguments.max_round,
+                incremental=arguments.incremental,
+                source_type=arguments.bws_source,
+                source_filter=arguments.source_filter,
+                snapshot=snapshot,
+                bws_data=section_data.get(section_number),
+                directory=directory,
+                verify_rendering=arguments.verify_rendering,
+                output_format=arguments.output_format,
+                write_tables=arguments.bidding_tables
+            )
+            bidding_parser.setup_goniec(
+                goniec_setup=arguments.send_files,
+                goniec_force=arguments.force_resend
+            )
+            bidding_parser.write_bidding_tables()
+            all_files = []
+            if arguments.jobs > 1:
+                all_files += bidding_parser.write_travellers(arguments.jobs)
+            else:
+                all_files += bidding_parser.write_bidding_scripts()
+                all_files += bidding_parser.write_bidding_links()
+                all_files += bidding_parser.compress_bidding_files()
+            bidding_parser.send_changed_files(all_files)
+            log.info('%d files already up to date, writes skipped',
+                     len(bidding_parser.get_unchanged_files()))
+        for fingerprint in fingerprints:
+            fingerprint.store()
     except Exception as ex:
         log.getLogger('root').error(ex)
         raise
+    finally:
+        if snapshot:
+            snapshot.close()
 
     log.info('--------- program ended ---------')
 
 if __name__ == '__main__':
+    # worker processes of frozen Windows executable start here as well
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
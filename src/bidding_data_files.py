@@ -0,0 +1,138 @@
+"""
+Bidding data for JFR Pary result pages - directory snapshots.
+
+Directories holding tournament files are listed once per run and queried
+for file existence, sizes and modification times from memory.
+Files written or removed by the program are updated in the snapshot.
+"""
+
+import fnmatch
+import logging as log
+from os import listdir, path, stat
+from stat import S_ISDIR
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        # without scandir, file stats are read only when they're needed
+        scandir = None
+
+
+class DirectorySnapshot(object):
+    """
+    In-memory listing of directories, each listed on first query.
+
+    Listing entries are: name, directory flag, (size, modification time)
+    of a file - None until it's read - and scandir entry, if available
+    (on Windows it carries file stats read along with the listing).
+    Without scandir, directory flag is unknown (None) until the entry
+    is checked, so that listing does not stat every file.
+    """
+
+    def __init__(self):
+        """Construct empty snapshot."""
+        self.__directories = {}
+
+    def __list_directory(self, directory):
+        """Read directory listing."""
+        entries = {}
+        if scandir is not None:
+            for entry in scandir(directory):
+                entries[path.normcase(entry.name)] = [
+                    entry.name, entry.is_dir(), None, entry]
+        else:
+            for name in listdir(directory):
+                entries[path.normcase(name)] = [name, None, None, None]
+        log.getLogger('files').debug('listed %d entries in %s',
+                                     len(entries), directory)
+        return entries
+
+    def __get_directory(self, directory):
+        """Return listing of a directory, reading it if necessary."""
+        key = path.normcase(path.abspath(directory))
+        if key not in self.__directories:
+            try:
+                self.__directories[key] = self.__list_directory(directory)
+            except OSError as ex:
+                log.getLogger('files').debug(
+                    'unable to list %s: %s', directory, ex)
+                self.__directories[key] = None
+        return self.__directories[key]
+
+    def __get_entry(self, file_path):
+        """Return listing entry for a path, or None if it does not exist."""
+        (directory, name) = path.split(path.abspath(file_path))
+        entries = self.__get_directory(directory)
+        if entries is None:
+            return None
+        return entries.get(path.normcase(name))
+
+    def __is_dir(self, entry, file_path):
+        """Check if an entry is a directory, reading its stats if needed."""
+        if entry[1] is None:
+            try:
+                file_stat = stat(file_path)
+            except OSError:
+                # removed since listing, as path.isdir would tell
+                entry[1] = False
+                return False
+            entry[1] = S_ISDIR(file_stat.st_mode)
+            if not entry[1]:
+                entry[2] = (file_stat.st_size, file_stat.st_mtime)
+        return entry[1]
+
+    def exists(self, file_path):
+        """Check if a file or directory exists."""
+        return self.__get_entry(file_path) is not None
+
+    def isfile(self, file_path):
+        """Check if a path describes an existing file."""
+        entry = self.__get_entry(file_path)
+        return entry is not None and not self.__is_dir(entry, file_path)
+
+    def stat(self, file_path):
+        """Return (size, modification time) of a file, or None."""
+        entry = self.__get_entry(file_path)
+        if entry is None or self.__is_dir(entry, file_path):
+            return None
+        if entry[2] is None:
+            file_stat = entry[3].stat() if entry[3] is not None \
+                else stat(file_path)
+            entry[2] = (file_stat.st_size, file_stat.st_mtime)
+        return entry[2]
+
+    def glob(self, pattern):
+        """Return paths matching a pattern (in its file name part only)."""
+        (directory, name_pattern) = path.split(pattern)
+        entries = self.__get_directory(directory or path.curdir)
+        if entries is None:
+            return []
+        return [path.join(directory, entry[0])
+                for entry in entries.itervalues()
+                if fnmatch.fnmatch(entry[0], name_pattern)]
+
+    def update(self, file_path, is_dir=False):
+        """
+        Register a file (or directory) written by the program.
+
+        File stats are read again when they're queried.
+        """
+        (directory, name) = path.split(path.abspath(file_path))
+        entries = self.__get_directory(directory)
+        if entries is not None:
+            entries[path.normcase(name)] = [name, is_dir, None, None]
+        if is_dir:
+            # directory created after it was found missing is empty
+            key = path.normcase(path.abspath(file_path))
+            if self.__directories.get(key) is None:
+                self.__directories[key] = {}
+
+    def remove(self, file_path):
+        """Register a file removed by the program."""
+        (directory, name) = path.split(path.abspath(file_path))
+        entries = self.__get_directory(directory)
+        if entries is not None:
+            entries.pop(path.normcase(name), None)
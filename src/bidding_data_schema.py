@@ -0,0 +1,121 @@
+"""
+Bidding data for JFR Pary result pages - BWS table schema.
+
+Columns of BWS tables used by the program and records their rows are mapped to.
+"""
+
+from collections import namedtuple
+
+
+class TableSchema(object):
+    """
+    Columns of a BWS table, mapped to fields of a named record.
+
+    Columns are described by (BWS column name, record field, value type),
+    value types being: 'int', 'bool', 'text' or 'date'.
+    Columns without a fixed name are described by their position instead
+    and force reading all columns of the table.
+    """
+
+    def __init__(self, table, record_name, columns, positional_columns=None):
+        """Construct table schema."""
+        self.table = table
+        self.columns = columns
+        self.positional_columns = positional_columns or []
+        self.record = namedtuple(
+            record_name,
+            [column[1] for column in self.columns + self.positional_columns])
+
+    def get_query(self, criteria='', alias=None, joins=''):
+        """
+        Compile SELECT query for the table, projected to known columns.
+
+        If table alias is specified, columns are qualified with it.
+        """
+        prefix = alias + '.' if alias is not None else ''
+        if len(self.positional_columns):
+            projection = prefix + '*'
+        else:
+            projection = ', '.join(
+                ['%s[%s]' % (prefix, column[0]) for column in self.columns])
+        return 'SELECT %s FROM %s%s%s%s' % (
+            projection, self.table,
+            ' AS ' + alias if alias is not None else '',
+            joins, criteria)
+
+    def get_value_types(self, column_names):
+        """Return value types for a row with specified columns."""
+        column_names = [name.lower() for name in column_names]
+        value_types = [None] * len(column_names)
+        for column in self.columns:
+            if column[0].lower() in column_names:
+                value_types[column_names.index(column[0].lower())] = column[2]
+        for column in self.positional_columns:
+            if column[0] < len(column_names):
+                value_types[column[0]] = column[2]
+        return value_types
+
+    def get_mapper(self, column_names):
+        """
+        Compile function mapping rows with specified columns to records.
+
+        Column names are matched case-insensitively (pypyodbc lowercases
+        them by default).
+        Raises ValueError if any of the named columns is missing.
+        Missing positional columns are mapped to None.
+        """
+        column_names = [name.lower() for name in column_names]
+        missing_columns = [column[0] for column in self.columns
+                           if column[0].lower() not in column_names]
+        if len(missing_columns):
+            raise ValueError('columns missing from %s table: %s' % (
+                self.table, ', '.join(missing_columns)))
+        indexes = [column_names.index(column[0].lower())
+                   for column in self.columns] \
+            + [column[0] if column[0] < len(column_names) else None
+               for column in self.positional_columns]
+        record = self.record
+
+        def map_row(row):
+            """Map BWS row to named record."""
+            return record._make(
+                [row[index] if index is not None else None
+                 for index in indexes])
+        return map_row
+
+
+ROUND_DATA = TableSchema(
+    'RoundData', 'RoundDataRecord',
+    [('Section', 'section', 'int'),
+     ('Table', 'table', 'int'),
+     ('Round', 'round', 'int'),
+     ('NSPair', 'ns_pair', 'int'),
+     ('EWPair', 'ew_pair', 'int'),
+     ('LowBoard', 'low_board', 'int'),
+     ('HighBoard', 'high_board', 'int')],
+    # 13th column, added by JFR Pary, has JFR number for the first board
+    [(12, 'jfr_board', 'int')])
+
+BIDDING_DATA = TableSchema(
+    'BiddingData', 'BiddingDataRecord',
+    [('ID', 'id', 'int'),
+     ('Section', 'section', 'int'),
+     ('Table', 'table', 'int'),
+     ('Round', 'round', 'int'),
+     ('Board', 'board', 'int'),
+     ('Counter', 'counter', 'int'),
+     ('Direction', 'direction', 'text'),
+     ('Bid', 'bid', 'text'),
+     ('DateLog', 'date_log', 'date'),
+     ('TimeLog', 'time_log', 'date'),
+     ('Erased', 'erased', 'bool')])
+
+RECEIVED_DATA = TableSchema(
+    'ReceivedData', 'ReceivedDataRecord',
+    [('Section', 'section', 'int'),
+     ('Table', 'table', 'int'),
+     ('Round', 'round', 'int'),
+     ('Board', 'board', 'int'),
+     ('DateLog', 'date_log', 'date'),
+     ('TimeLog', 'time_log', 'date'),
+     ('Erased', 'erased', 'bool')])
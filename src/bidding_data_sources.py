@@ -0,0 +1,494 @@
+"""
+Bidding data for JFR Pary result pages - BWS data sources.
+
+Readers providing RoundData, BiddingData and ReceivedData rows, either
+directly from BWS file (through Access ODBC) or from BWS data exported
+to SQLite database or to CSV files.
+"""
+
+import csv
+import hashlib
+import logging as log
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from os import close, path, remove, stat
+
+from bidding_data_schema import BIDDING_DATA, RECEIVED_DATA, ROUND_DATA
+
+# formats of date/time values in exported BWS data
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%H:%M:%S',
+                '%m/%d/%y %H:%M:%S', '%m/%d/%Y %H:%M:%S']
+
+
+def parse_date(value):
+    """Convert exported date/time value to datetime object."""
+    if isinstance(value, basestring):
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format)
+            except ValueError:
+                pass
+        raise ValueError('unrecognized date/time value: %s' % value)
+    return value
+
+
+def parse_bool(value):
+    """
+    Convert exported boolean value to bool.
+
+    Flags can be exported as booleans, numbers or text (e.g. 0/1, True/False).
+    """
+    if isinstance(value, basestring):
+        return value.strip().lower() not in ['', '0', 'false', 'no']
+    return bool(value) if value is not None else None
+
+
+def create_snapshot(file_path, attempts=5, delay=1.0):
+    """
+    Copy a file which may be modified while it's being copied.
+
+    Copy is considered consistent if file size and modification time
+    did not change during the copy. Returns path to the temporary copy.
+    """
+    (snapshot_handle, snapshot_path) = tempfile.mkstemp(
+        suffix=path.splitext(file_path)[1], prefix='bidding_data_')
+    close(snapshot_handle)
+    for attempt in range(0, attempts):
+        file_stat = stat(file_path)
+        shutil.copyfile(file_path, snapshot_path)
+        copied_stat = stat(file_path)
+        if (file_stat.st_size, file_stat.st_mtime) == \
+           (copied_stat.st_size, copied_stat.st_mtime) and \
+           path.getsize(snapshot_path) == copied_stat.st_size:
+            log.getLogger('source').info(
+                'copied %s to %s', file_path, snapshot_path)
+            return snapshot_path
+        log.getLogger('source').info(
+            '%s changed while copying (attempt %d), retrying',
+            file_path, attempt + 1)
+        time.sleep(delay)
+    remove(snapshot_path)
+    raise IOError('unable to copy %s, file keeps changing' % file_path)
+
+
+def remove_snapshot(snapshot_path):
+    """Remove snapshot copy, logging failures."""
+    try:
+        remove(snapshot_path)
+    except OSError as ex:
+        log.getLogger('source').warning(
+            'unable to remove snapshot %s: %s', snapshot_path, ex)
+
+
+class BWSSnapshot(object):
+    """
+    Snapshot copy of BWS file, shared by all data sources of a run.
+
+    Copy is made when its path is first requested and removed
+    when the snapshot is closed.
+    """
+
+    def __init__(self, bws_path):
+        """Construct snapshot for specified BWS file (no copy is made yet)."""
+        self.__bws_path = bws_path
+        self.__snapshot_path = None
+
+    def get_path(self):
+        """Return path to the copy, copying the file if necessary."""
+        if self.__snapshot_path is None:
+            self.__snapshot_path = create_snapshot(self.__bws_path)
+        return self.__snapshot_path
+
+    def close(self):
+        """Remove the copy, if it was made."""
+        if self.__snapshot_path is not None:
+            remove_snapshot(self.__snapshot_path)
+            self.__snapshot_path = None
+
+    def __enter__(self):
+        """Open snapshot."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close snapshot, removing the copy."""
+        self.close()
+
+
+def get_timestamp(entry):
+    """Merge entry date and time into single datetime object."""
+    return datetime.combine(entry.date_log.date(), entry.time_log.time())
+
+
+class BWSSource(object):
+    """
+    Base class for BWS data sources.
+
+    Rows are yielded one by one as named records (see bidding_data_schema)
+    and have to be consumed while the data source is open.
+    Data is limited to single section (if section number is specified)
+    and to rounds up to the specified one.
+    File data sources can be read from a snapshot copy of the file,
+    so that the file is not locked while it's being read: either from
+    their own copy, or from a BWSSnapshot shared with other data sources.
+    """
+
+    _snapshot_path = None
+
+    def __init__(self, bws_path, section_number=0, max_round=0,
+                 snapshot=False):
+        """Construct data source for specified BWS file/export path."""
+        self._bws_path = bws_path
+        self._section_number = section_number
+        self._max_round = max_round if max_round > 0 else sys.maxint
+        self._snapshot = snapshot
+
+    def _get_read_path(self):
+        """Return path to read data from, creating snapshot if necessary."""
+        if self._snapshot and path.isfile(self._bws_path):
+            if isinstance(self._snapshot, BWSSnapshot):
+                return self._snapshot.get_path()
+            self._snapshot_path = create_snapshot(self._bws_path)
+            return self._snapshot_path
+        return self._bws_path
+
+    def _remove_snapshot(self):
+        """Remove snapshot made by the data source itself."""
+        if self._snapshot_path is not None:
+            remove_snapshot(self._snapshot_path)
+            self._snapshot_path = None
+
+    def __enter__(self):
+        """Open data source."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close data source, removing its snapshot."""
+        self._remove_snapshot()
+
+    def get_round_data(self):
+        """Yield RoundData rows."""
+        raise NotImplementedError()
+
+    def get_bidding_data(self, min_id=0, skip_erased=False):
+        """
+        Yield BiddingData rows with ID greater than specified.
+
+        Calls entered before the latest result erasure of their board
+        can be skipped by the data source itself.
+        """
+        raise NotImplementedError()
+
+    def get_erased_boards(self):
+        """Yield erased ReceivedData rows."""
+        raise NotImplementedError()
+
+    def get_bidding_entry(self, bid_id):
+        """Return BiddingData row with specified ID, or None."""
+        for bid in self.get_bidding_data(bid_id - 1):
+            if bid.id == bid_id:
+                return bid
+        return None
+
+    def _get_round_data_stats(self):
+        """
+        Return row count and hash of RoundData rows.
+
+        Rows may be corrected in place (pair numbers, board ranges),
+        so all columns read from the table are hashed (the table is small).
+        """
+        rows = sorted([tuple(row) for row in self.get_round_data()])
+        return [len(rows), hashlib.md5(repr(rows)).hexdigest()]
+
+    def get_table_stats(self):
+        """
+        Return row counts (and highest IDs, if available) of BWS tables.
+
+        Stats are meant only to detect changes in BWS data between runs.
+        """
+        bid_ids = [bid.id for bid in self.get_bidding_data()]
+        return {
+            'RoundData': self._get_round_data_stats(),
+            'BiddingData': [len(bid_ids), max(bid_ids or [None])],
+            'ReceivedData': [len(list(self.get_erased_boards()))]
+        }
+
+
+class SQLSource(BWSSource):
+    """Base class for BWS data sources accessed with SQL queries."""
+
+    _connection = None
+    # number of rows fetched from database at once
+    _batch_size = 1000
+    # SQL expression merging entry date and time, for a table alias
+    _timestamp_expression = 'DateValue({0}.DateLog) + TimeValue({0}.TimeLog)'
+    # conversions of fetched values, by value type (see TableSchema)
+    _converters = {'bool': parse_bool}
+
+    def _get_criteria(self, alias=None):
+        prefix = alias + '.' if alias is not None else ''
+        criteria_string = ' WHERE '
+        criteria_string += '%sSection = %d' % (prefix, self._section_number) \
+                           if self._section_number > 0 else '1 = 1'
+        criteria_string += ' AND %sRound <= %d' % (prefix, self._max_round)
+        return criteria_string
+
+    def _get_erasure_join(self):
+        """
+        Compile join of latest result erasures for BiddingData.
+
+        BiddingData is aliased as "b", erasure timestamps as "e.LastErased".
+        """
+        return (
+            ' LEFT JOIN (SELECT r.Section, r.[Table], r.Round, r.Board,' +
+            ' MAX(%s) AS LastErased FROM ReceivedData AS r%s AND r.Erased' +
+            ' GROUP BY r.Section, r.[Table], r.Round, r.Board) AS e' +
+            ' ON (b.Section = e.Section AND b.[Table] = e.[Table]' +
+            ' AND b.Round = e.Round AND b.Board = e.Board)') % (
+                self._timestamp_expression.format('r'),
+                self._get_criteria('r'))
+
+    def _fetch_rows(self, cursor):
+        rows = cursor.fetchmany(self._batch_size)
+        while len(rows) > 0:
+            for row in rows:
+                yield row
+            rows = cursor.fetchmany(self._batch_size)
+
+    def _fetch(self, schema, query=None):
+        if query is None:
+            query = schema.get_query(self._get_criteria())
+        log.getLogger('source').debug('query: %s', query)
+        cursor = self._connection.cursor().execute(query)
+        column_names = [column[0] for column in cursor.description]
+        map_row = schema.get_mapper(column_names)
+        converters = [
+            (index, self._converters[value_type]) for index, value_type
+            in enumerate(schema.get_value_types(column_names))
+            if value_type in self._converters]
+        for row in self._fetch_rows(cursor):
+            if len(converters):
+                row = list(row)
+                for index, converter in converters:
+                    row[index] = converter(row[index])
+            yield map_row(row)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close database connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        BWSSource.__exit__(self, exc_type, exc_value, traceback)
+
+    def get_round_data(self):
+        """Yield RoundData rows."""
+        return self._fetch(ROUND_DATA)
+
+    def get_bidding_data(self, min_id=0, skip_erased=False):
+        """
+        Yield BiddingData rows with ID greater than specified.
+
+        Calls entered before the latest result erasure of their board
+        can be skipped by the query itself.
+        """
+        if skip_erased:
+            # join changes row order, and call erasures must follow calls
+            query = BIDDING_DATA.get_query(
+                self._get_criteria('b') +
+                (' AND b.ID > %d' % min_id if min_id > 0 else '') +
+                ' AND (e.LastErased IS NULL OR %s > e.LastErased)' % (
+                    self._timestamp_expression.format('b')) +
+                ' ORDER BY b.ID',
+                'b', self._get_erasure_join())
+        else:
+            query = BIDDING_DATA.get_query(
+                self._get_criteria() +
+                (' AND ID > %d' % min_id if min_id > 0 else ''))
+        return self._fetch(BIDDING_DATA, query)
+
+    def get_erased_boards(self):
+        """Yield erased ReceivedData rows."""
+        return self._fetch(
+            RECEIVED_DATA,
+            RECEIVED_DATA.get_query(self._get_criteria() + ' AND Erased'))
+
+    def get_bidding_entry(self, bid_id):
+        """Return BiddingData row with specified ID, or None."""
+        for bid in self._fetch(
+                BIDDING_DATA,
+                BIDDING_DATA.get_query(
+                    self._get_criteria() + ' AND ID = %d' % bid_id)):
+            return bid
+        return None
+
+    def get_table_stats(self):
+        """
+        Return row counts (and highest IDs, if available) of BWS tables.
+
+        Stats are meant only to detect changes in BWS data between runs.
+        """
+        cursor = self._connection.cursor()
+        criteria = self._get_criteria()
+        stats = {'RoundData': self._get_round_data_stats()}
+        for table, query in [
+                ('BiddingData',
+                 'SELECT COUNT(*), MAX(ID) FROM BiddingData' + criteria),
+                ('ReceivedData',
+                 'SELECT COUNT(*), MAX(ID) FROM ReceivedData' + criteria)]:
+            log.getLogger('source').debug('query: %s', query)
+            stats[table] = list(cursor.execute(query).fetchone())
+        query = 'SELECT COUNT(*) FROM ReceivedData' + criteria + ' AND Erased'
+        log.getLogger('source').debug('query: %s', query)
+        stats['ReceivedData'] += list(cursor.execute(query).fetchone())
+        return stats
+
+
+class ODBCSource(SQLSource):
+    """BWS file read through MS Access ODBC driver."""
+
+    def __enter__(self):
+        """Connect to BWS file."""
+        # ODBC is only available on Windows, import it only when needed
+        import pypyodbc
+        read_path = self._get_read_path()
+        try:
+            self._connection = pypyodbc.win_connect_mdb(read_path)
+        except Exception:
+            # __exit__ is not called if the source cannot be opened
+            self._remove_snapshot()
+            raise
+        return self
+
+
+class SQLiteSource(SQLSource):
+    """
+    BWS tables exported to SQLite database.
+
+    Skipping erased calls in queries requires date/time values
+    stored in ISO format.
+    """
+
+    _timestamp_expression = "date({0}.DateLog) || ' ' || time({0}.TimeLog)"
+    # dates are stored as text
+    _converters = {'bool': parse_bool, 'date': parse_date}
+
+    def __enter__(self):
+        """Connect to SQLite database."""
+        read_path = self._get_read_path()
+        try:
+            self._connection = sqlite3.connect(
+                read_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        except Exception:
+            # __exit__ is not called if the source cannot be opened
+            self._remove_snapshot()
+            raise
+        return self
+
+
+class CSVSource(BWSSource):
+    """
+    BWS tables exported to CSV files in a directory (e.g. with mdb-export).
+
+    Files are named after tables: RoundData.csv, BiddingData.csv
+    and ReceivedData.csv, with column names in the first row.
+    """
+
+    @staticmethod
+    def __convert_value(value, value_type):
+        value = value.decode('utf-8')
+        if not len(value):
+            return None
+        if value_type == 'date':
+            return parse_date(value)
+        if value_type == 'int':
+            return int(value)
+        if value_type == 'bool':
+            return parse_bool(value)
+        return value
+
+    def __read_table(self, schema, criteria=None):
+        table_path = path.join(self._bws_path, schema.table + '.csv')
+        log.getLogger('source').debug('reading CSV file: %s', table_path)
+        with file(table_path, 'rb') as table_file:
+            reader = csv.reader(table_file)
+            columns = reader.next()
+            map_row = schema.get_mapper(columns)
+            value_types = schema.get_value_types(columns)
+            for row in reader:
+                record = map_row([
+                    self.__convert_value(value, value_type)
+                    for value, value_type in zip(row, value_types)])
+                if self._section_number > 0 and \
+                   record.section != self._section_number:
+                    continue
+                if record.round > self._max_round:
+                    continue
+                if criteria is not None and not criteria(record):
+                    continue
+                yield record
+
+    def get_round_data(self):
+        """Yield RoundData rows."""
+        return self.__read_table(ROUND_DATA)
+
+    def get_bidding_data(self, min_id=0, skip_erased=False):
+        """
+        Yield BiddingData rows with ID greater than specified.
+
+        Calls entered before the latest result erasure of their board
+        can be skipped while the file is read.
+        """
+        erased = {}
+        if skip_erased:
+            for entry in self.get_erased_boards():
+                board = (entry.section, entry.table, entry.round, entry.board)
+                timestamp = get_timestamp(entry)
+                if board not in erased or erased[board] < timestamp:
+                    erased[board] = timestamp
+        return self.__read_table(
+            BIDDING_DATA,
+            lambda record: record.id > min_id and (
+                (record.section, record.table,
+                 record.round, record.board) not in erased or
+                erased[(record.section, record.table,
+                        record.round, record.board)] < get_timestamp(record)))
+
+    def get_erased_boards(self):
+        """Yield erased ReceivedData rows."""
+        return self.__read_table(
+            RECEIVED_DATA, lambda record: record.erased)
+
+
+# data source classes available, by type name
+SOURCE_TYPES = {
+    'odbc': ODBCSource,
+    'sqlite': SQLiteSource,
+    'csv': CSVSource
+}
+
+
+def get_data_source(bws_path, source_type=None,
+                    section_number=0, max_round=0, snapshot=False):
+    """
+    Construct data source for specified path.
+
+    If source type is not specified, it's detected from the path:
+    directories are read as CSV exports, *.sqlite and *.db files
+    as SQLite databases, all other files through ODBC.
+    Snapshot copies are made only for single-file sources, snapshot
+    can be either a flag or a BWSSnapshot shared with other sources.
+    """
+    if source_type is None:
+        if path.isdir(bws_path):
+            source_type = 'csv'
+        elif path.splitext(bws_path)[1].lower() in ['.sqlite', '.db']:
+            source_type = 'sqlite'
+        else:
+            source_type = 'odbc'
+    log.getLogger('source').info('reading %s as %s data source',
+                                 bws_path, source_type)
+    return SOURCE_TYPES[source_type](bws_path, section_number, max_round,
+                                     snapshot)